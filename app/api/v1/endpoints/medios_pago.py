@@ -19,6 +19,7 @@ from app.schemas.medio_pago import (
 from app.services.medio_pago_service import MedioPagoService
 from app.services.firestore_service import FirestoreService
 from app.dependencies import get_current_user, get_firestore_service
+from app.core.database import get_pooled_connection
 
 
 router = APIRouter(prefix="/medios-pago", tags=["medios_pago"])
@@ -93,20 +94,8 @@ async def listar_medios_pago(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # Get payment methods from MariaDB
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
@@ -202,23 +191,10 @@ async def crear_medio_pago(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation (within transaction)
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
@@ -241,15 +217,8 @@ async def crear_medio_pago(
         # STEP 2: Firestore Sync
         # ==========================================
         try:
-            # Get all active payment methods for this negocio
-            all_payment_methods = await medio_pago_service.get_all_active_payment_methods(
-                cursor, negocio_id
-            )
-
-            # Sync to Firestore
-            await medio_pago_service.sync_all_payment_methods_to_firestore(
-                negocio_id, all_payment_methods
-            )
+            # Only the new payment method is written to Firestore
+            await medio_pago_service.sync_add_or_update_payment_method(negocio_id, result)
 
             logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
 
@@ -346,23 +315,10 @@ async def actualizar_medio_pago(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
@@ -394,15 +350,17 @@ async def actualizar_medio_pago(
         # STEP 2: Firestore Sync
         # ==========================================
         try:
-            # Get all active payment methods
-            all_payment_methods = await medio_pago_service.get_all_active_payment_methods(
-                cursor, negocio_id
-            )
-
-            # Sync to Firestore
-            await medio_pago_service.sync_all_payment_methods_to_firestore(
-                negocio_id, all_payment_methods
-            )
+            if payload.descripcion is None:
+                # Firestore key unchanged: rewrite only this method's datos_pago entry
+                await medio_pago_service.sync_add_or_update_payment_method(negocio_id, result)
+            else:
+                # The key may have changed and the old one is unknown here; full sync
+                all_payment_methods = await medio_pago_service.get_all_active_payment_methods(
+                    cursor, negocio_id
+                )
+                await medio_pago_service.sync_all_payment_methods_to_firestore(
+                    negocio_id, all_payment_methods
+                )
 
             logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
 
@@ -483,28 +441,15 @@ async def eliminar_medio_pago(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
-        # Delete payment method
-        deleted = await medio_pago_service.delete_medio_pago_with_transaction(
+        # Delete payment method (returns its descripcion for the Firestore removal)
+        descripcion = await medio_pago_service.delete_medio_pago_with_transaction(
             conn=conn,
             cursor=cursor,
             medio_pago_id=medio_pago_id,
@@ -512,7 +457,7 @@ async def eliminar_medio_pago(
             user_id=user_id
         )
 
-        if not deleted:
+        if descripcion is None:
             cursor.close()
             conn.close()
             raise HTTPException(
@@ -527,15 +472,8 @@ async def eliminar_medio_pago(
         # STEP 2: Firestore Sync
         # ==========================================
         try:
-            # Get remaining active payment methods
-            all_payment_methods = await medio_pago_service.get_all_active_payment_methods(
-                cursor, negocio_id
-            )
-
-            # Sync to Firestore (will remove deleted payment method from arrays/maps)
-            await medio_pago_service.sync_all_payment_methods_to_firestore(
-                negocio_id, all_payment_methods
-            )
+            # Remove only the deleted payment method from medios_pago/datos_pago
+            await medio_pago_service.sync_remove_payment_method(negocio_id, descripcion)
 
             logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
 
@@ -20,6 +20,7 @@ from app.schemas.promocion import (
 from app.services.promocion_service import PromocionService
 from app.services.firestore_service import FirestoreService
 from app.dependencies import get_current_user, get_firestore_service
+from app.core.database import get_pooled_connection
 
 
 router = APIRouter(prefix="/promociones", tags=["promociones"])
@@ -94,20 +95,8 @@ async def listar_promociones(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # Get promotions from MariaDB
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
@@ -118,7 +107,7 @@ async def listar_promociones(
                 titulo,
                 descripcion,
                 tipo_descuento,
-                valor_descuento,
+                CAST(valor_descuento AS DOUBLE) AS valor_descuento,
                 fecha_inicio,
                 fecha_fin,
                 activo,
@@ -137,11 +126,6 @@ async def listar_promociones(
         cursor.close()
         conn.close()
 
-        # Convert Decimal to float for JSON serialization
-        for row in results:
-            if row.get('valor_descuento') is not None:
-                row['valor_descuento'] = float(row['valor_descuento'])
-
         # Convert to response models
         promociones = [PromocionResponse(**row) for row in results]
 
@@ -213,23 +197,10 @@ async def crear_promocion(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation (within transaction)
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
@@ -353,23 +324,10 @@ async def actualizar_promocion(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
@@ -486,23 +444,10 @@ async def eliminar_promocion(
             f"Negocio: {negocio_id}, IP: {request.client.host}"
         )
 
-        # Get database configuration
-        from app.config import settings
-        import os
-
         # ==========================================
         # STEP 1: MariaDB Operation
         # ==========================================
-        conn = mysql.connector.connect(
-            host=getattr(settings, 'DB_HOST', os.getenv('DB_HOST')),
-            port=int(getattr(settings, 'DB_PORT', os.getenv('DB_PORT', 3306))),
-            user=getattr(settings, 'DB_USER', os.getenv('DB_USER')),
-            password=getattr(settings, 'DB_PASSWORD', os.getenv('DB_PASSWORD')),
-            database=getattr(settings, 'DB_NAME', os.getenv('DB_NAME')),
-            charset='utf8mb4',
-            autocommit=False,
-            buffered=True
-        )
+        conn = get_pooled_connection()
 
         cursor = conn.cursor(dictionary=True)
 
@@ -531,7 +476,7 @@ async def eliminar_promocion(
         # ==========================================
         try:
             # Delete this specific promotion from Firestore
-            await promocion_service.delete_promocion_from_firestore(promocion_id)
+            await promocion_service.delete_promocion_from_firestore(promocion_id, negocio_id)
 
             logger.info(f"Firestore delete successful for promocion_id {promocion_id}")
 
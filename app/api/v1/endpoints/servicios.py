@@ -398,25 +398,28 @@ async def actualizar_servicio(
         # ==========================================
         # STEP 2: Firestore Sync
         # ==========================================
-        try:
-            # Get all active services
-            all_services = await servicio_service.get_all_active_services(cursor, negocio_id)
-
-            # Sync to Firestore
-            await servicio_service.sync_all_services_to_firestore(negocio_id, all_services)
-
-            logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
-
-        except Exception as firestore_error:
-            logger.error(f"Firestore sync failed: {str(firestore_error)}")
-            conn.rollback()
-            cursor.close()
-            conn.close()
-
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Error al sincronizar con Firestore. La transacción ha sido revertida."
-            )
+        # precios_cita only depends on nombre and precio: skip the sync when
+        # neither was sent (e.g. a no-op save or a descripcion-only change)
+        if payload.nombre is not None or payload.precio is not None:
+            try:
+                # Get all active services
+                all_services = await servicio_service.get_all_active_services(cursor, negocio_id)
+
+                # Sync to Firestore
+                await servicio_service.sync_all_services_to_firestore(negocio_id, all_services)
+
+                logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
+
+            except Exception as firestore_error:
+                logger.error(f"Firestore sync failed: {str(firestore_error)}")
+                conn.rollback()
+                cursor.close()
+                conn.close()
+
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Error al sincronizar con Firestore. La transacción ha sido revertida."
+                )
 
         # ==========================================
         # STEP 3: Commit
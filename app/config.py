@@ -53,6 +53,8 @@ class Settings(BaseSettings):
 
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = "credentials/firebase-credentials.json"
+    # Guardar promociones dentro de negocios/{id} (mapa 'promociones') en lugar de la colección 'promociones'
+    FIRESTORE_PROMOCIONES_IN_NEGOCIO: bool = False
     
     @field_validator('ALLOWED_ORIGINS')
     @classmethod
@@ -1,14 +1,20 @@
-"""Configuración de base de datos MySQL sin pool"""
+"""Configuración de base de datos MySQL con pool de conexiones"""
 import mysql.connector
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
 from contextlib import contextmanager
+from threading import Lock
 from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-def _create_connection():
-    """Crea una nueva conexión a MySQL"""
-    return mysql.connector.connect(
+_pool = None
+_pool_lock = Lock()
+
+def _connection_config() -> dict:
+    """Parámetros de conexión a MySQL"""
+    return dict(
         host=settings.DB_HOST,
         port=settings.DB_PORT,
         user=settings.DB_USER,
@@ -19,6 +25,33 @@ def _create_connection():
         buffered=True  # Importante: evita el error "Unread result found"
     )
 
+def _get_pool() -> MySQLConnectionPool:
+    """Pool de conexiones compartido (se crea en el primer uso)"""
+    global _pool
+    if _pool is None:
+        # Doble chequeo: dos hilos del threadpool pueden llegar aquí a la vez
+        with _pool_lock:
+            if _pool is None:
+                _pool = MySQLConnectionPool(
+                    pool_name='api_nebula',
+                    pool_size=settings.DB_POOL_SIZE,
+                    **_connection_config()
+                )
+    return _pool
+
+def _create_connection():
+    """Obtiene una conexión del pool (close() la devuelve al pool)"""
+    try:
+        return _get_pool().get_connection()
+    except PoolError:
+        # Pool agotado: no bloquear la petición, abrir una conexión dedicada
+        logger.warning("MySQL pool exhausted, opening a dedicated connection")
+        return mysql.connector.connect(**_connection_config())
+
+def get_pooled_connection():
+    """Conexión para endpoints que gestionan su propia transacción"""
+    return _create_connection()
+
 @contextmanager
 def get_db_connection():
     """Context manager para obtener conexión"""
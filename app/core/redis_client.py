@@ -1,13 +1,22 @@
 """Cliente Redis configurado"""
 import redis
 import json
-from typing import Any, Optional, List
+import orjson
+from typing import Any, Dict, Optional, List
 from app.config import settings
 import logging
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# datetime se delega a str() para conservar el formato que producía json.dumps(default=str)
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _dumps(value: Any) -> bytes:
+    """Serializar a JSON (bytes) con orjson"""
+    return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+
 class RedisClient:
     def __init__(self):
         self.client = redis.Redis(
@@ -31,7 +40,7 @@ class RedisClient:
     def set_json(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Guardar objeto JSON con TTL opcional"""
         try:
-            json_value = json.dumps(value, default=str)
+            json_value = _dumps(value)
             if ttl:
                 return self.client.setex(key, ttl, json_value)
             return self.client.set(key, json_value)
@@ -39,6 +48,22 @@ class RedisClient:
             logger.error(f"Redis set_json error: {e}")
             return False
     
+    def set_json_many(self, values: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Guardar varios objetos JSON en un solo round-trip (pipeline)"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in values.items():
+                json_value = _dumps(value)
+                if ttl:
+                    pipe.setex(key, ttl, json_value)
+                else:
+                    pipe.set(key, json_value)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis set_json_many error: {e}")
+            return False
+    
     def get_json(self, key: str) -> Optional[Any]:
         """Obtener objeto JSON"""
         try:
@@ -86,7 +111,7 @@ class RedisClient:
         """Establecer valor con TTL opcional"""
         try:
             if isinstance(value, (dict, list)):
-                value = json.dumps(value, default=str)
+                value = _dumps(value)
             
             if expire:
                 return self.client.setex(key, expire, value)
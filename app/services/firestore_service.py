@@ -4,20 +4,47 @@
 
 """Servicio para operaciones con Firestore"""
 import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import Dict, List, Any, Optional
+from firebase_admin import credentials, firestore, firestore_async
+from typing import Dict, List, Any, Optional, Callable
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import os
 
 logger = logging.getLogger(__name__)
 
+# Pool compartido para las llamadas bloqueantes del SDK de Firestore.
+# Acota el número de hilos para que una ráfaga de escrituras no agote el executor por defecto.
+_FIRESTORE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix='fs')
+
+# Máximo de escrituras por commit de un WriteBatch de Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
+
+@lru_cache(maxsize=4096)
+def cached_doc_ref(db: Any, collection: str, doc_id: Any) -> Any:
+    """DocumentReference cacheada por cliente, colección e ID (el ID se convierte a str una sola vez).
+
+    Solo para documentos fijos por negocio: los IDs de colecciones que crecen sin límite
+    desplazarían del caché a las referencias que sí se reutilizan.
+    """
+    return db.collection(collection).document(str(doc_id))
+
+
 class FirestoreService:
     """Servicio para interactuar con Firestore"""
     
     def __init__(self):
         self.db = None
+        self.async_db = None
+        self._executor = _FIRESTORE_EXECUTOR
         self._initialize_firebase()
+
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Ejecutar una llamada bloqueante del SDK en el pool de Firestore"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
     
     def _initialize_firebase(self):
         """Inicializar Firebase Admin SDK"""
@@ -25,6 +52,7 @@ class FirestoreService:
             # Verificar si ya está inicializado
             if firebase_admin._apps:
                 self.db = firestore.client()
+                self.async_db = firestore_async.client()
                 return
             
             # Configurar credenciales desde variable de entorno o archivo
@@ -46,6 +74,8 @@ class FirestoreService:
             
             firebase_admin.initialize_app(cred)
             self.db = firestore.client()
+            # Cliente nativo asíncrono (gRPC) para escrituras desde endpoints async
+            self.async_db = firestore_async.client()
             
             logger.info("✅ Firebase Firestore initialized successfully")
             
@@ -264,18 +294,17 @@ class FirestoreService:
             # Obtener valores únicos de codigo_negocio
             query = self.db.collection("negocios").where("estado", "==", True)
             
-            docs = query.stream()
+            # stream() es bloqueante: materializar fuera del event loop
+            docs = await self.run_blocking(list, query.stream())
             negocios = set()
             
             for doc in docs:
-                logger.info(f"Negocio ID: {doc.id}, Data: {doc.to_dict()}")
                 codigo_negocio = doc.id             
                 if codigo_negocio:
                     negocios.add(codigo_negocio)
 
-            # Imprimir el contenido de negocios
-            logger.info(f"Negocios encontrados: {list(negocios)}")
-            logger.info(f"Total de negocios: {len(negocios)}")
+            # Detalle de negocios solo en DEBUG (se llama en cada ciclo del monitor)
+            logger.debug("Negocios encontrados: %s", list(negocios))
             
             return list(negocios)
             
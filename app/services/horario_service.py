@@ -3,30 +3,62 @@ Service layer for horarios (business hours) management.
 Handles transaction logic between MariaDB and Firestore.
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+import hashlib
+import json
 import logging
+import time
 import mysql.connector
 from datetime import date, timedelta
-from app.services.firestore_service import FirestoreService
+from itertools import chain
+from operator import itemgetter
+from app.services.firestore_service import FirestoreService, cached_doc_ref
 
 
 logger = logging.getLogger(__name__)
 
 
-# Mapping of Spanish day names to day numbers (1=Monday, 7=Sunday)
-DIA_SEMANA_MAP = {
-    'lunes': 1,
-    'martes': 2,
-    'miercoles': 3,
-    'jueves': 4,
-    'viernes': 5,
-    'sabado': 6,
-    'domingo': 7
-}
+# Spanish day names ordered by day number (index = dia_semana - 1, 1=Monday, 7=Sunday)
+_DAYS = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo')
 
-# Reverse mapping
-DIA_NUMERO_MAP = {v: k for k, v in DIA_SEMANA_MAP.items()}
+# Mapping of Spanish day names to day numbers (number -> name is _DAYS[n - 1])
+DIA_SEMANA_MAP = {dia: numero for numero, dia in enumerate(_DAYS, start=1)}
+
+# Template for the working days map (all days off by default)
+_DIAS_FALSE_TEMPLATE = {dia: False for dia in _DAYS}
+
+# Column extractors for dictionary cursors (same order as the SELECTs)
+_HORARIO_ROW = itemgetter('k', 'dia_semana', 'hora_inicio', 'hora_fin', 'intervalo_citas')
+_HORARIO_ACTUAL_ROW = itemgetter('id', 'dia_semana', 'hora_inicio', 'hora_fin')
+_EXCEPCION_ROW = itemgetter('id', 'tipo_excepcion', 'fecha_inicio', 'fecha_fin', 'motivo')
+
+# Kept as a single constant so the statement text is identical on every call
+# (the driver rewrites executemany() into one multi-row INSERT)
+_INSERT_HORARIO_SQL = """
+    INSERT INTO horarios_atencion
+        (negocio_id, dia_semana, hora_inicio, hora_fin, creado_por)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+def _fmt_time(hora) -> str:
+    """Format a MariaDB TIME value (timedelta or time) as HH:MM."""
+    if hora is None:
+        return "00:00"
+    if hasattr(hora, 'total_seconds'):
+        seconds = int(hora.total_seconds())
+    else:
+        seconds = hora.hour * 3600 + hora.minute * 60
+    hours, rem = divmod(seconds, 3600)
+    return f"{hours:02d}:{rem // 60:02d}"
+
+
+# Last horarios payload hash synced to Firestore per negocio_id: (hash, expires_at).
+# Lets repeated saves of the same schedule skip the Firestore write.
+_SYNC_CACHE_TTL = 300
+_horarios_sync_cache: Dict[int, Tuple[bytes, float]] = {}
 
 
 class HorarioService:
@@ -65,38 +97,66 @@ class HorarioService:
             Exception: If database operation fails
         """
         try:
-            # Step 1: Delete existing horarios for this negocio (soft delete)
-            cursor.execute(
-                """
-                UPDATE horarios_atencion
-                SET eliminado = 1, eliminado_por = %s, fecha_eliminacion = NOW()
-                WHERE negocio_id = %s
-                """,
-                (user_id, negocio_id)
-            )
-            logger.info(f"Soft deleted existing horarios for negocio_id {negocio_id}")
+            # Normalize day names once so lookups below are direct
+            horarios = {dia.lower(): rangos for dia, rangos in horarios.items()}
 
-            # Step 2: Insert new horarios
+            # Step 1: Build the requested set of (dia_semana, inicio, fin) ranges
+            nuevos = {}
             for dia_nombre, rangos in horarios.items():
-                dia_numero = DIA_SEMANA_MAP.get(dia_nombre.lower())
+                dia_numero = DIA_SEMANA_MAP.get(dia_nombre)
                 if dia_numero is None:
-                    logger.warning(f"Invalid day name: {dia_nombre}")
+                    logger.warning("Invalid day name: %s", dia_nombre)
                     continue
 
-                # Insert each time range for this day
                 for rango in rangos:
-                    cursor.execute(
-                        """
-                        INSERT INTO horarios_atencion
-                            (negocio_id, dia_semana, hora_inicio, hora_fin, creado_por)
-                        VALUES (%s, %s, %s, %s, %s)
-                        """,
-                        (negocio_id, dia_numero, rango['inicio'], rango['fin'], user_id)
-                    )
-
-            logger.info(f"Inserted new horarios for negocio_id {negocio_id}")
-
-            # Step 3: Update intervalo_citas in consultorios table
+                    nuevos[(dia_numero, rango['inicio'], rango['fin'])] = None
+
+            # Step 2: Diff against the active horarios so re-saving the same
+            # schedule does not rewrite every row
+            cursor.execute(
+                """
+                SELECT id, dia_semana, hora_inicio, hora_fin
+                FROM horarios_atencion
+                WHERE negocio_id = %s AND eliminado = 0
+                """,
+                (negocio_id,)
+            )
+            actuales = cursor.fetchall()
+            if actuales and not isinstance(actuales[0], tuple):
+                actuales = map(_HORARIO_ACTUAL_ROW, actuales)
+
+            eliminar_ids = []
+            for horario_id, dia_numero, hora_inicio, hora_fin in actuales:
+                key = (dia_numero, _fmt_time(hora_inicio), _fmt_time(hora_fin))
+                if key in nuevos:
+                    # Already stored: keep it and don't insert it again
+                    del nuevos[key]
+                else:
+                    eliminar_ids.append(horario_id)
+
+            # Step 3: Soft delete ranges that are no longer configured
+            if eliminar_ids:
+                placeholders = ', '.join(['%s'] * len(eliminar_ids))
+                cursor.execute(
+                    f"""
+                    UPDATE horarios_atencion
+                    SET eliminado = 1, eliminado_por = %s, fecha_eliminacion = NOW()
+                    WHERE id IN ({placeholders})
+                    """,
+                    (user_id, *eliminar_ids)
+                )
+                logger.info("Soft deleted %s horarios for negocio_id %s", len(eliminar_ids), negocio_id)
+
+            # Step 4: Insert new ranges
+            if nuevos:
+                cursor.executemany(
+                    _INSERT_HORARIO_SQL,
+                    [(negocio_id, dia_numero, inicio, fin, user_id) for dia_numero, inicio, fin in nuevos]
+                )
+
+            logger.info("Inserted new horarios for negocio_id %s", negocio_id)
+
+            # Step 5: Update intervalo_citas in consultorios table
             cursor.execute(
                 """
                 UPDATE consultorios
@@ -108,15 +168,15 @@ class HorarioService:
 
             rows_affected = cursor.rowcount
             if rows_affected == 0:
-                logger.warning(f"No consultorio found with id {negocio_id}")
+                logger.warning("No consultorio found with id %s", negocio_id)
                 # Don't fail, just log warning
 
-            logger.info(f"Updated intervalo_citas in consultorios for negocio_id {negocio_id}")
+            logger.info("Updated intervalo_citas in consultorios for negocio_id %s", negocio_id)
 
             return True
 
         except Exception as e:
-            logger.error(f"Error saving horarios in MariaDB: {str(e)}")
+            logger.error("Error saving horarios in MariaDB: %s", e)
             raise
 
     async def sync_horarios_to_firestore(
@@ -139,43 +199,50 @@ class HorarioService:
             Exception: If Firestore operation fails
         """
         try:
-            logger.info(f"Syncing horarios to Firestore for negocio_id {negocio_id}")
+            logger.info("Syncing horarios to Firestore for negocio_id %s", negocio_id)
 
             # Update Firestore document in 'negocios' collection
-            doc_ref = self.db.collection('negocios').document(str(negocio_id))
+            doc_ref = cached_doc_ref(self.db, 'negocios', negocio_id)
 
             # Prepare horarios for Firestore - only include days with configured hours
+            # Day names are normalized to lowercase, as in MariaDB
             firestore_horarios = {}
             for dia, rangos in horarios.items():
                 # Only add days that have at least one time range
-                if rangos and len(rangos) > 0:
-                    firestore_horarios[dia] = rangos
+                if rangos:
+                    firestore_horarios[dia.lower()] = rangos
+
+            payload = {
+                'horarios': firestore_horarios,
+                'intervalo_citas': intervalo_citas,
+                'duracion_cita': intervalo_citas
+            }
+
+            # Skip the write if this exact payload was synced recently
+            payload_hash = hashlib.blake2b(
+                json.dumps(payload, sort_keys=True).encode(), digest_size=8
+            ).digest()
+            cached = _horarios_sync_cache.get(negocio_id)
+            if cached and cached[0] == payload_hash and cached[1] > time.monotonic():
+                logger.info("Horarios unchanged for negocio_id %s, skipping Firestore sync", negocio_id)
+                return
 
-            # Update or create document
+            payload['updated_at'] = firestore.SERVER_TIMESTAMP
+
+            # Update or create document. update() is kept (rather than
+            # set(merge=True)) so days removed from 'horarios' are dropped.
             try:
-                doc_ref.update({
-                    'horarios': firestore_horarios,
-                    'intervalo_citas': intervalo_citas,
-                    'duracion_cita': intervalo_citas,
-                    'updated_at': firestore.SERVER_TIMESTAMP
-                })
-            except Exception as e:
-                # If document doesn't exist, create it
-                if 'NOT_FOUND' in str(e) or 'not found' in str(e).lower():
-                    logger.info(f"Document not found for negocio_id {negocio_id}, creating new document")
-                    doc_ref.set({
-                        'horarios': firestore_horarios,
-                        'intervalo_citas': intervalo_citas,
-                        'duracion_cita': intervalo_citas,
-                        'updated_at': firestore.SERVER_TIMESTAMP
-                    })
-                else:
-                    raise
+                await self.firestore_service.run_blocking(doc_ref.update, payload)
+            except NotFound:
+                logger.info("Document not found for negocio_id %s, creating new document", negocio_id)
+                await self.firestore_service.run_blocking(doc_ref.set, payload)
 
-            logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
+            _horarios_sync_cache[negocio_id] = (payload_hash, time.monotonic() + _SYNC_CACHE_TTL)
+            logger.info("Firestore sync successful for negocio_id %s", negocio_id)
 
         except Exception as e:
-            logger.error(f"Firestore sync failed for negocio_id {negocio_id}: {str(e)}")
+            _horarios_sync_cache.pop(negocio_id, None)
+            logger.error("Firestore sync failed for negocio_id %s: %s", negocio_id, e)
             raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
 
     async def get_horarios_from_mariadb(
@@ -194,108 +261,52 @@ class HorarioService:
             Dictionary with dias_laborables, horarios, and intervalo_citas
         """
         try:
-            # Get active horarios
+            # Get active horarios and intervalo_citas in a single round-trip.
+            # Rows are tagged with 'h' (horario) or 'c' (consultorio).
             cursor.execute(
                 """
-                SELECT dia_semana, hora_inicio, hora_fin
+                SELECT 'h' AS k, dia_semana, hora_inicio, hora_fin, NULL AS intervalo_citas
                 FROM horarios_atencion
                 WHERE negocio_id = %s AND eliminado = 0
-                ORDER BY dia_semana, hora_inicio
-                """,
-                (negocio_id,)
-            )
-            results = cursor.fetchall()
-
-            # Get intervalo_citas from consultorios table
-            cursor.execute(
-                """
-                SELECT intervalo_citas
+                UNION ALL
+                SELECT 'c' AS k, NULL, NULL, NULL, intervalo_citas
                 FROM consultorios
                 WHERE id = %s
+                ORDER BY k DESC, dia_semana, hora_inicio
                 """,
-                (negocio_id,)
+                (negocio_id, negocio_id)
             )
-            consultorio_result = cursor.fetchone()
+            results = cursor.fetchall()
 
             # Default intervalo_citas if not found or NULL
             intervalo_citas = 30
-            if consultorio_result:
-                if isinstance(consultorio_result, tuple):
-                    intervalo_citas = consultorio_result[0] if consultorio_result[0] is not None else 30
-                else:
-                    # Get value from dict, use 30 if None or not found
-                    intervalo_citas = consultorio_result.get('intervalo_citas')
-                    if intervalo_citas is None:
-                        intervalo_citas = 30
 
             # Initialize all days
-            dias_laborables = {
-                'lunes': False,
-                'martes': False,
-                'miercoles': False,
-                'jueves': False,
-                'viernes': False,
-                'sabado': False,
-                'domingo': False
-            }
-
-            horarios = {
-                'lunes': [],
-                'martes': [],
-                'miercoles': [],
-                'jueves': [],
-                'viernes': [],
-                'sabado': [],
-                'domingo': []
-            }
+            dias_laborables = _DIAS_FALSE_TEMPLATE.copy()
+            horarios = {dia: [] for dia in _DAYS}
 
             # Process results
-            for row in results:
-                if isinstance(row, tuple):
-                    dia_numero, hora_inicio, hora_fin = row
-                else:
-                    dia_numero = row.get('dia_semana')
-                    hora_inicio = row.get('hora_inicio')
-                    hora_fin = row.get('hora_fin')
+            fmt = _fmt_time
+            # The row shape is fixed per cursor, so it is checked only once
+            if results and not isinstance(results[0], tuple):
+                results = map(_HORARIO_ROW, results)
+
+            for k, dia_numero, hora_inicio, hora_fin, intervalo in results:
+                if k == 'c':
+                    if intervalo is not None:
+                        intervalo_citas = intervalo
+                    continue
 
-                dia_nombre = DIA_NUMERO_MAP.get(dia_numero)
+                dia_nombre = _DAYS[dia_numero - 1] if dia_numero is not None and 1 <= dia_numero <= 7 else None
                 if dia_nombre is None:
-                    logger.warning(f"Invalid day number: {dia_numero}")
+                    logger.warning("Invalid day number: %s", dia_numero)
                     continue
 
                 # Mark day as working day
                 dias_laborables[dia_nombre] = True
 
-                # Convert time objects to string format HH:MM
-                if hora_inicio is not None:
-                    # Handle both time objects and timedelta objects
-                    if hasattr(hora_inicio, 'strftime'):
-                        hora_inicio_str = hora_inicio.strftime('%H:%M')
-                    else:
-                        # If it's a timedelta, convert to hours:minutes
-                        total_seconds = int(hora_inicio.total_seconds())
-                        hours = total_seconds // 3600
-                        minutes = (total_seconds % 3600) // 60
-                        hora_inicio_str = f"{hours:02d}:{minutes:02d}"
-                else:
-                    hora_inicio_str = "00:00"
-
-                if hora_fin is not None:
-                    if hasattr(hora_fin, 'strftime'):
-                        hora_fin_str = hora_fin.strftime('%H:%M')
-                    else:
-                        total_seconds = int(hora_fin.total_seconds())
-                        hours = total_seconds // 3600
-                        minutes = (total_seconds % 3600) // 60
-                        hora_fin_str = f"{hours:02d}:{minutes:02d}"
-                else:
-                    hora_fin_str = "00:00"
-
-                # Add time range
-                horarios[dia_nombre].append({
-                    'inicio': hora_inicio_str,
-                    'fin': hora_fin_str
-                })
+                # Add time range (TIME values formatted as HH:MM)
+                horarios[dia_nombre].append({'inicio': fmt(hora_inicio), 'fin': fmt(hora_fin)})
 
             return {
                 'dias_laborables': dias_laborables,
@@ -304,7 +315,7 @@ class HorarioService:
             }
 
         except Exception as e:
-            logger.error(f"Error getting horarios from MariaDB: {str(e)}")
+            logger.error("Error getting horarios from MariaDB: %s", e)
             raise
 
     # ===== Excepciones (Non-working days) =====
@@ -353,42 +364,17 @@ class HorarioService:
                 (negocio_id, tipo, fecha_inicio, fecha_fin, motivo, user_id)
             )
 
-            excepcion_id = cursor.lastrowid
-
-            # Get the created record
-            cursor.execute(
-                """
-                SELECT id, tipo_excepcion, fecha_inicio, fecha_fin, motivo
-                FROM dias_no_laborables
-                WHERE id = %s
-                """,
-                (excepcion_id,)
-            )
-            result = cursor.fetchone()
-
-            if not result:
-                raise Exception("Failed to retrieve created exception")
-
-            # Convert to dictionary
-            if isinstance(result, tuple):
-                return {
-                    'id': result[0],
-                    'tipo': result[1],
-                    'fecha_inicio': result[2],
-                    'fecha_fin': result[3],
-                    'motivo': result[4]
-                }
-            else:
-                return {
-                    'id': result['id'],
-                    'tipo': result['tipo_excepcion'],
-                    'fecha_inicio': result['fecha_inicio'],
-                    'fecha_fin': result['fecha_fin'],
-                    'motivo': result['motivo']
-                }
+            # Build the result from the inserted values instead of reading the row back
+            return {
+                'id': cursor.lastrowid,
+                'tipo': tipo,
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin,
+                'motivo': motivo
+            }
 
         except Exception as e:
-            logger.error(f"Error creating exception in MariaDB: {str(e)}")
+            logger.error("Error creating exception in MariaDB: %s", e)
             raise
 
     async def get_excepciones_from_mariadb(
@@ -416,31 +402,32 @@ class HorarioService:
                 """,
                 (negocio_id,)
             )
-            results = cursor.fetchall()
 
-            excepciones = []
-            for row in results:
-                if isinstance(row, tuple):
-                    excepciones.append({
-                        'id': row[0],
-                        'tipo': row[1],
-                        'fecha_inicio': row[2],
-                        'fecha_fin': row[3],
-                        'motivo': row[4]
-                    })
-                else:
-                    excepciones.append({
-                        'id': row['id'],
-                        'tipo': row['tipo_excepcion'],
-                        'fecha_inicio': row['fecha_inicio'],
-                        'fecha_fin': row['fecha_fin'],
-                        'motivo': row['motivo']
-                    })
+            # Iterate the cursor directly instead of materializing fetchall().
+            # The row shape is fixed per cursor, so it is checked only once.
+            rows = iter(cursor)
+            first = next(rows, None)
+            if first is None:
+                return []
+            rows = chain((first,), rows)
+            if not isinstance(first, tuple):
+                rows = map(_EXCEPCION_ROW, rows)
+
+            excepciones = [
+                {
+                    'id': excepcion_id,
+                    'tipo': tipo,
+                    'fecha_inicio': fecha_inicio,
+                    'fecha_fin': fecha_fin,
+                    'motivo': motivo
+                }
+                for excepcion_id, tipo, fecha_inicio, fecha_fin, motivo in rows
+            ]
 
             return excepciones
 
         except Exception as e:
-            logger.error(f"Error getting excepciones from MariaDB: {str(e)}")
+            logger.error("Error getting excepciones from MariaDB: %s", e)
             raise
 
     async def delete_excepcion_with_transaction(
@@ -479,14 +466,14 @@ class HorarioService:
             rows_affected = cursor.rowcount
 
             if rows_affected > 0:
-                logger.info(f"Exception soft deleted in MariaDB: id={excepcion_id}, negocio_id={negocio_id}")
+                logger.info("Exception soft deleted in MariaDB: id=%s, negocio_id=%s", excepcion_id, negocio_id)
                 return True
             else:
-                logger.warning(f"Exception not found for deletion: id={excepcion_id}, negocio_id={negocio_id}")
+                logger.warning("Exception not found for deletion: id=%s, negocio_id=%s", excepcion_id, negocio_id)
                 return False
 
         except Exception as e:
-            logger.error(f"Error deleting exception in MariaDB: {str(e)}")
+            logger.error("Error deleting exception in MariaDB: %s", e)
             raise
 
     async def sync_excepcion_to_firestore(
@@ -522,7 +509,7 @@ class HorarioService:
             Exception: If Firestore operation fails
         """
         try:
-            logger.info(f"Syncing excepcion {excepcion_id} to Firestore for negocio_id {negocio_id}")
+            logger.info("Syncing excepcion %s to Firestore for negocio_id %s", excepcion_id, negocio_id)
 
             # Create nombre: "tipo - motivo"
             nombre = f"{tipo} - {motivo}"
@@ -551,12 +538,12 @@ class HorarioService:
             # Update Firestore document in 'dias_no_laborales' collection
             # Use the MySQL ID as the document ID
             doc_ref = self.db.collection('dias_no_laborales').document(str(excepcion_id))
-            doc_ref.set(firestore_data)
+            await self.firestore_service.run_blocking(doc_ref.set, firestore_data)
 
-            logger.info(f"Firestore sync successful for excepcion_id {excepcion_id}")
+            logger.info("Firestore sync successful for excepcion_id %s", excepcion_id)
 
         except Exception as e:
-            logger.error(f"Firestore sync failed for excepcion_id {excepcion_id}: {str(e)}")
+            logger.error("Firestore sync failed for excepcion_id %s: %s", excepcion_id, e)
             raise Exception(f"Error al sincronizar excepción con Firestore: {str(e)}")
 
     async def delete_excepcion_from_firestore(
@@ -573,18 +560,45 @@ class HorarioService:
             Exception: If Firestore operation fails
         """
         try:
-            logger.info(f"Deleting excepcion {excepcion_id} from Firestore")
+            logger.info("Deleting excepcion %s from Firestore", excepcion_id)
 
             # Delete document from 'dias_no_laborales' collection
             doc_ref = self.db.collection('dias_no_laborales').document(str(excepcion_id))
-            doc_ref.delete()
+            await self.firestore_service.run_blocking(doc_ref.delete)
 
-            logger.info(f"Firestore delete successful for excepcion_id {excepcion_id}")
+            logger.info("Firestore delete successful for excepcion_id %s", excepcion_id)
 
         except Exception as e:
-            logger.error(f"Firestore delete failed for excepcion_id {excepcion_id}: {str(e)}")
+            logger.error("Firestore delete failed for excepcion_id %s: %s", excepcion_id, e)
             raise Exception(f"Error al eliminar excepción de Firestore: {str(e)}")
 
+    async def get_excepciones_from_firestore(
+        self,
+        negocio_id: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Get all exceptions for a business from Firestore.
+        Uses a single query on 'negocio_id' (one RPC) instead of per-document reads.
+
+        Args:
+            negocio_id: Business ID
+
+        Returns:
+            List of exception documents, each including its 'id'
+
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            query = self.db.collection('dias_no_laborales').where('negocio_id', '==', negocio_id)
+            docs = await self.firestore_service.run_blocking(lambda: list(query.stream()))
+
+            return [doc.to_dict() | {'id': doc.id} for doc in docs]
+
+        except Exception as e:
+            logger.error("Firestore read failed for negocio_id %s: %s", negocio_id, e)
+            raise Exception(f"Error al obtener excepciones de Firestore: {str(e)}")
+
 
 # Dependency injection helper
 def get_horario_service(
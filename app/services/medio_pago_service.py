@@ -3,15 +3,135 @@ Service layer for medio_pago (payment methods) management.
 Handles transaction logic between MariaDB and Firestore.
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+from functools import lru_cache
 from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
+import asyncio
+import hashlib
+import json
 import logging
+import re
+import time
 import mysql.connector
-from app.services.firestore_service import FirestoreService
+from app.services.firestore_service import FirestoreService, FIRESTORE_BATCH_LIMIT, cached_doc_ref
 
 
 logger = logging.getLogger(__name__)
 
+# Sentinel resolved once instead of through the firebase_admin facade on every write
+_SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+
+# Runs of non-alphanumeric characters (underscore included) in payment names
+_NON_ALNUM_RUN = re.compile(r'[\W_]+')
+
+# Fields replaced as a whole when syncing payment methods with set(merge=...)
+_PAYMENT_FIELDS = ['medios_pago', 'datos_pago', 'updated_at']
+
+
+# SHA-1 of the last medios_pago/datos_pago written per negocio_id: (digest, expires_at)
+_SYNC_HASH_TTL = 300
+_last_sync_hash: Dict[int, Tuple[bytes, float]] = {}
+
+# Optional fields of update_medio_pago_with_transaction; bit i of the mask is field i
+_UPDATE_FIELDS = ('descripcion', 'detalle', 'nombre_titular', 'numero_cuenta')
+
+# UPDATE statement for every combination of provided fields, keyed by bitmask.
+# MariaDB has no UPDATE ... RETURNING: the UPDATE and the read-back SELECT are
+# sent as one multi-statement batch (one round-trip). The SELECT uses the same
+# predicate, so no row means not found.
+_UPDATE_TEMPLATES = {
+    mask: f"""
+        UPDATE medios_pago
+        SET {', '.join([f'{field} = %s' for bit, field in enumerate(_UPDATE_FIELDS) if mask & (1 << bit)] + ['updated_by = %s'])}
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE AND activo = TRUE;
+        SELECT
+            id, negocio_id, descripcion, detalle, nombre_titular,
+            numero_cuenta, activo, eliminado, created_at, updated_at,
+            created_by, updated_by
+        FROM medios_pago
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE AND activo = TRUE
+    """
+    for mask in range(1 << len(_UPDATE_FIELDS))
+}
+
+# Fixed statements, built once at import so every call sends identical text
+_INSERT_MEDIO_PAGO_SQL = """
+    INSERT INTO medios_pago
+        (negocio_id, descripcion, detalle, nombre_titular, numero_cuenta, created_by)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    RETURNING
+        id,
+        negocio_id,
+        descripcion,
+        detalle,
+        nombre_titular,
+        numero_cuenta,
+        activo,
+        eliminado,
+        created_at,
+        updated_at,
+        created_by,
+        updated_by
+"""
+
+# Locks the row and reads its descripcion, which the incremental Firestore
+# removal needs once the soft delete has run
+_SELECT_MEDIO_PAGO_FOR_DELETE_SQL = """
+    SELECT descripcion
+    FROM medios_pago
+    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
+    FOR UPDATE
+"""
+
+_DELETE_MEDIO_PAGO_SQL = """
+    UPDATE medios_pago
+    SET eliminado = TRUE, activo = FALSE, updated_by = %s
+    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
+"""
+
+_SELECT_ACTIVE_MEDIOS_PAGO_SQL = """
+    SELECT descripcion, nombre_titular, numero_cuenta
+    FROM medios_pago
+    WHERE negocio_id = %s AND eliminado = FALSE AND activo = TRUE
+    ORDER BY descripcion
+"""
+
+
+def _datos_pago_path(key: str) -> str:
+    """
+    Field path of a payment method's entry in 'datos_pago' for update().
+    Keys keep accented letters and may start with a digit, which a plain
+    'datos_pago.{key}' path rejects; FieldPath backtick-quotes such segments.
+
+    Args:
+        key: Normalized payment method name
+
+    Returns:
+        Field path string (e.g., "datos_pago.`tarjeta_de_crédito`")
+    """
+    return FieldPath('datos_pago', key).to_api_repr()
+
+
+@lru_cache(maxsize=1024)
+def _normalize_payment_name_for_firestore(descripcion: str) -> str:
+    """
+    Convert payment method description to lowercase with underscores for Firestore key.
+    Cached: the same descriptions come back on every sync.
+
+    Args:
+        descripcion: Payment method description (e.g., "Tarjeta de Crédito")
+
+    Returns:
+        Normalized name (e.g., "tarjeta_de_credito")
+    """
+    # Replace each run of spaces/special characters/underscores with a single
+    # underscore (alphanumerics, including accented letters, are kept)
+    normalized = _NON_ALNUM_RUN.sub('_', descripcion.strip().lower())
+    # Remove leading/trailing underscores
+    return normalized.strip('_')
+
 
 class MedioPagoService:
     """Service for managing payment methods with dual persistence (MariaDB + Firestore)"""
@@ -19,32 +139,46 @@ class MedioPagoService:
     def __init__(self, firestore_service: FirestoreService):
         self.firestore_service = firestore_service
         self.db = firestore_service.db
+        self.async_db = firestore_service.async_db
 
-    def _normalize_payment_name_for_firestore(self, descripcion: str) -> str:
+    def _build_payment_payload(
+        self,
+        medios_pago: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[str], Dict[str, Dict[str, str]]]:
         """
-        Convert payment method description to lowercase with underscores for Firestore key.
+        Build the Firestore 'medios_pago' array and 'datos_pago' map.
+        Consumes medios_pago in a single pass, so a row generator works.
 
         Args:
-            descripcion: Payment method description (e.g., "Tarjeta de Crédito")
+            medios_pago: Iterable of payment method dictionaries
 
         Returns:
-            Normalized name (e.g., "tarjeta_de_credito")
+            Tuple of (medios_pago array, datos_pago map)
         """
-        # Replace spaces with underscores and convert to lowercase
-        normalized = descripcion.strip().lower().replace(' ', '_')
-        # Remove special characters (keep only alphanumeric and underscores)
-        normalized = ''.join(c if c.isalnum() or c == '_' else '_' for c in normalized)
-        # Replace multiple consecutive underscores with single underscore
-        while '__' in normalized:
-            normalized = normalized.replace('__', '_')
-        # Remove leading/trailing underscores
-        normalized = normalized.strip('_')
-        return normalized
+        medios_pago_array = []
+        datos_pago_map = {}
+
+        for medio_pago in medios_pago:
+            descripcion = medio_pago.get('descripcion', '')
+            nombre_titular = medio_pago.get('nombre_titular', '')
+            numero_cuenta = medio_pago.get('numero_cuenta', '')
+
+            # Normalize description for Firestore key
+            key = _normalize_payment_name_for_firestore(descripcion)
+            medios_pago_array.append(key)
+
+            # Build datos_pago entry
+            datos_pago_map[key] = {
+                'nombre': nombre_titular or '',
+                'numero': numero_cuenta or ''
+            }
+
+        return medios_pago_array, datos_pago_map
 
     async def sync_all_payment_methods_to_firestore(
         self,
         negocio_id: int,
-        medios_pago: List[Dict[str, Any]]
+        medios_pago: Iterable[Dict[str, Any]]
     ) -> None:
         """
         Sync all payment methods for a business to Firestore.
@@ -67,30 +201,26 @@ class MedioPagoService:
 
         Args:
             negocio_id: Business ID
-            medios_pago: List of payment method dictionaries
+            medios_pago: Iterable of payment method dictionaries
 
         Raises:
             Exception: If Firestore operation fails
         """
         try:
             # Build medios_pago array and datos_pago map
-            medios_pago_array = []
-            datos_pago_map = {}
-
-            for medio_pago in medios_pago:
-                descripcion = medio_pago.get('descripcion', '')
-                nombre_titular = medio_pago.get('nombre_titular', '')
-                numero_cuenta = medio_pago.get('numero_cuenta', '')
-
-                # Normalize description for Firestore key
-                key = self._normalize_payment_name_for_firestore(descripcion)
-                medios_pago_array.append(key)
-
-                # Build datos_pago entry
-                datos_pago_map[key] = {
-                    'nombre': nombre_titular or '',
-                    'numero': numero_cuenta or ''
-                }
+            medios_pago_array, datos_pago_map = self._build_payment_payload(medios_pago)
+
+            # Nothing to write if this negocio was last synced with the same data
+            payload_hash = hashlib.sha1(
+                json.dumps(
+                    {'medios_pago': medios_pago_array, 'datos_pago': datos_pago_map},
+                    sort_keys=True
+                ).encode()
+            ).digest()
+            cached = _last_sync_hash.get(negocio_id)
+            if cached and cached[0] == payload_hash and cached[1] > time.monotonic():
+                logger.info(f"Payment methods unchanged for negocio_id {negocio_id}, skipping Firestore sync")
+                return
 
             logger.info(
                 f"Syncing {len(medios_pago_array)} payment methods to Firestore "
@@ -98,34 +228,198 @@ class MedioPagoService:
             )
 
             # Update Firestore document in 'negocios' collection
-            doc_ref = self.db.collection('negocios').document(str(negocio_id))
+            doc_ref = cached_doc_ref(self.async_db, 'negocios', negocio_id)
+
+            payload = {
+                'medios_pago': medios_pago_array,
+                'datos_pago': datos_pago_map,
+                'updated_at': _SERVER_TIMESTAMP
+            }
 
             # Use update() to set medios_pago and datos_pago
             # This ensures deleted payment methods are removed from Firestore
             try:
-                doc_ref.update({
-                    'medios_pago': medios_pago_array,
-                    'datos_pago': datos_pago_map,
-                    'updated_at': firestore.SERVER_TIMESTAMP
-                })
-            except Exception as e:
+                await doc_ref.update(payload)
+            except NotFound:
                 # If document doesn't exist, create it with set()
-                if 'NOT_FOUND' in str(e) or 'not found' in str(e).lower():
-                    logger.info(f"Document not found for negocio_id {negocio_id}, creating new document")
-                    doc_ref.set({
-                        'medios_pago': medios_pago_array,
-                        'datos_pago': datos_pago_map,
-                        'updated_at': firestore.SERVER_TIMESTAMP
-                    })
-                else:
-                    raise
+                logger.info(f"Document not found for negocio_id {negocio_id}, creating new document")
+                await doc_ref.set(payload)
+
+            _last_sync_hash[negocio_id] = (payload_hash, time.monotonic() + _SYNC_HASH_TTL)
+            logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
+
+        except Exception as e:
+            _last_sync_hash.pop(negocio_id, None)
+            logger.error(f"Firestore sync failed for negocio_id {negocio_id}: {str(e)}")
+            raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
+
+    async def sync_add_or_update_payment_method(
+        self,
+        negocio_id: int,
+        medio_pago: Dict[str, Any]
+    ) -> None:
+        """
+        Add or update a single payment method in Firestore.
+        Only the method's key in 'medios_pago' and its 'datos_pago' entry are
+        written (ArrayUnion plus a quoted field path), not the whole map.
+
+        Args:
+            negocio_id: Business ID
+            medio_pago: Payment method dictionary
+
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            key = _normalize_payment_name_for_firestore(medio_pago.get('descripcion', ''))
+            if not key:
+                raise ValueError("Payment method description is required for Firestore sync")
+
+            datos = {
+                'nombre': medio_pago.get('nombre_titular') or '',
+                'numero': medio_pago.get('numero_cuenta') or ''
+            }
+
+            logger.info(f"Syncing payment method '{key}' to Firestore for negocio_id {negocio_id}")
+
+            doc_ref = cached_doc_ref(self.async_db, 'negocios', negocio_id)
+            try:
+                await doc_ref.update({
+                    'medios_pago': firestore.ArrayUnion([key]),
+                    _datos_pago_path(key): datos,
+                    'updated_at': _SERVER_TIMESTAMP
+                })
+            except NotFound:
+                logger.info(f"Document not found for negocio_id {negocio_id}, creating new document")
+                await doc_ref.set({
+                    'medios_pago': [key],
+                    'datos_pago': {key: datos},
+                    'updated_at': _SERVER_TIMESTAMP
+                })
+
+            # The full-sync hash no longer describes the document
+            _last_sync_hash.pop(negocio_id, None)
+            logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
+
+        except Exception as e:
+            _last_sync_hash.pop(negocio_id, None)
+            logger.error(f"Firestore sync failed for negocio_id {negocio_id}: {str(e)}")
+            raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
+
+    async def sync_remove_payment_method(
+        self,
+        negocio_id: int,
+        descripcion: str
+    ) -> None:
+        """
+        Remove a single payment method from Firestore.
+        Drops its key from 'medios_pago' (ArrayRemove) and deletes its
+        'datos_pago' entry (DELETE_FIELD).
 
+        Args:
+            negocio_id: Business ID
+            descripcion: Payment method description
+
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            key = _normalize_payment_name_for_firestore(descripcion)
+            if not key:
+                raise ValueError("Payment method description is required for Firestore sync")
+
+            logger.info(f"Removing payment method '{key}' from Firestore for negocio_id {negocio_id}")
+
+            doc_ref = cached_doc_ref(self.async_db, 'negocios', negocio_id)
+            try:
+                await doc_ref.update({
+                    'medios_pago': firestore.ArrayRemove([key]),
+                    _datos_pago_path(key): firestore.DELETE_FIELD,
+                    'updated_at': _SERVER_TIMESTAMP
+                })
+            except NotFound:
+                logger.info(f"Document not found for negocio_id {negocio_id}, nothing to remove")
+
+            _last_sync_hash.pop(negocio_id, None)
             logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
 
         except Exception as e:
+            _last_sync_hash.pop(negocio_id, None)
             logger.error(f"Firestore sync failed for negocio_id {negocio_id}: {str(e)}")
             raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
 
+    async def sync_all_payment_methods_bulk(
+        self,
+        items: List[Tuple[int, List[Dict[str, Any]]]],
+        concurrency: int = 16
+    ) -> None:
+        """
+        Sync payment methods for several businesses concurrently.
+        Runs sync_all_payment_methods_to_firestore per business, with at most
+        `concurrency` Firestore round-trips in flight.
+
+        Args:
+            items: List of (negocio_id, medios_pago) pairs
+            concurrency: Maximum number of concurrent syncs
+
+        Raises:
+            Exception: If any Firestore sync fails
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(negocio_id: int, medios_pago: List[Dict[str, Any]]) -> None:
+            async with sem:
+                await self.sync_all_payment_methods_to_firestore(negocio_id, medios_pago)
+
+        await asyncio.gather(*(_one(negocio_id, medios_pago) for negocio_id, medios_pago in items))
+
+    async def sync_many_payment_methods_to_firestore(
+        self,
+        negocio_medios: Dict[int, List[Dict[str, Any]]]
+    ) -> None:
+        """
+        Sync payment methods for several businesses to Firestore using batched writes.
+        Each commit carries up to FIRESTORE_BATCH_LIMIT documents (one RPC per chunk).
+
+        'medios_pago' and 'datos_pago' are replaced as whole fields (set with
+        field-level merge), so deleted payment methods are removed as in
+        sync_all_payment_methods_to_firestore.
+
+        Args:
+            negocio_medios: Map of business ID to its list of payment method dictionaries
+
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            logger.info(f"Batch syncing payment methods to Firestore for {len(negocio_medios)} negocios")
+
+            items = list(negocio_medios.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                batch = self.async_db.batch()
+                for negocio_id, medios_pago in items[start:start + FIRESTORE_BATCH_LIMIT]:
+                    medios_pago_array, datos_pago_map = self._build_payment_payload(medios_pago)
+                    batch.set(
+                        cached_doc_ref(self.async_db, 'negocios', negocio_id),
+                        {
+                            'medios_pago': medios_pago_array,
+                            'datos_pago': datos_pago_map,
+                            'updated_at': _SERVER_TIMESTAMP
+                        },
+                        merge=_PAYMENT_FIELDS
+                    )
+                await batch.commit()
+
+            # Batched writes bypass the per-negocio hash; forget what we had
+            for negocio_id in negocio_medios:
+                _last_sync_hash.pop(negocio_id, None)
+
+            logger.info(f"Firestore batch sync successful for {len(negocio_medios)} negocios")
+
+        except Exception as e:
+            logger.error(f"Firestore batch sync failed: {str(e)}")
+            raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
+
     async def create_medio_pago_with_transaction(
         self,
         conn: mysql.connector.MySQLConnection,
@@ -158,49 +452,17 @@ class MedioPagoService:
             Exception: If database operation fails
         """
         try:
+            # RETURNING (MariaDB 10.5+) gives back the created row in the same round-trip
             cursor.execute(
-                """
-                INSERT INTO medios_pago
-                    (negocio_id, descripcion, detalle, nombre_titular, numero_cuenta, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
+                _INSERT_MEDIO_PAGO_SQL,
                 (negocio_id, descripcion, detalle, nombre_titular, numero_cuenta, user_id)
             )
-
-            medio_pago_id = cursor.lastrowid
-
-            # Get the created record
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    negocio_id,
-                    descripcion,
-                    detalle,
-                    nombre_titular,
-                    numero_cuenta,
-                    activo,
-                    eliminado,
-                    created_at,
-                    updated_at,
-                    created_by,
-                    updated_by
-                FROM medios_pago
-                WHERE id = %s
-                """,
-                (medio_pago_id,)
-            )
             result = cursor.fetchone()
 
             if not result:
                 raise Exception("Failed to retrieve created payment method")
 
-            # Convert tuple to dictionary (if cursor is not dictionary=True)
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
-            logger.info(f"Payment method created in MariaDB: id={medio_pago_id}, negocio_id={negocio_id}")
+            logger.info(f"Payment method created in MariaDB: id={result['id']}, negocio_id={negocio_id}")
             return result
 
         except Exception as e:
@@ -240,82 +502,25 @@ class MedioPagoService:
             Exception: If database operation fails
         """
         try:
-            # Build dynamic update query
-            update_fields = []
+            # Pick the precomputed UPDATE for the set of provided fields
+            mask = 0
             params = []
+            for bit, value in enumerate((descripcion, detalle, nombre_titular, numero_cuenta)):
+                if value is not None:
+                    mask |= 1 << bit
+                    params.append(value)
 
-            if descripcion is not None:
-                update_fields.append("descripcion = %s")
-                params.append(descripcion)
-
-            if detalle is not None:
-                update_fields.append("detalle = %s")
-                params.append(detalle)
-
-            if nombre_titular is not None:
-                update_fields.append("nombre_titular = %s")
-                params.append(nombre_titular)
-
-            if numero_cuenta is not None:
-                update_fields.append("numero_cuenta = %s")
-                params.append(numero_cuenta)
-
-            # Always update updated_by
-            update_fields.append("updated_by = %s")
-            params.append(user_id)
-
-            if not update_fields:
-                # No fields to update, just return current record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, descripcion, detalle, nombre_titular,
-                        numero_cuenta, activo, eliminado, created_at, updated_at,
-                        created_by, updated_by
-                    FROM medios_pago
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE AND activo = TRUE
-                    """,
-                    (medio_pago_id, negocio_id)
-                )
-                result = cursor.fetchone()
-            else:
-                # Add WHERE clause parameters
-                params.extend([medio_pago_id, negocio_id])
-
-                query = f"""
-                    UPDATE medios_pago
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE AND activo = TRUE
-                """
-
-                cursor.execute(query, params)
-                rows_affected = cursor.rowcount
-
-                if rows_affected == 0:
-                    return None
-
-                # Get the updated record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, descripcion, detalle, nombre_titular,
-                        numero_cuenta, activo, eliminado, created_at, updated_at,
-                        created_by, updated_by
-                    FROM medios_pago
-                    WHERE id = %s
-                    """,
-                    (medio_pago_id,)
-                )
-                result = cursor.fetchone()
+            # updated_by is always set, then the UPDATE and read-back SELECT predicates
+            params.extend([user_id, medio_pago_id, negocio_id, medio_pago_id, negocio_id])
+
+            result = None
+            for stmt_cursor in cursor.execute(_UPDATE_TEMPLATES[mask], params, multi=True):
+                if stmt_cursor.with_rows:
+                    result = stmt_cursor.fetchone()
 
             if not result:
                 return None
 
-            # Convert tuple to dictionary
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
             logger.info(f"Payment method updated in MariaDB: id={medio_pago_id}, negocio_id={negocio_id}")
             return result
 
@@ -330,7 +535,7 @@ class MedioPagoService:
         medio_pago_id: int,
         negocio_id: int,
         user_id: Optional[int] = None
-    ) -> bool:
+    ) -> Optional[str]:
         """
         Soft delete payment method within an existing MariaDB transaction.
 
@@ -342,34 +547,34 @@ class MedioPagoService:
             user_id: User ID
 
         Returns:
-            True if deleted, False if not found
+            Description of the deleted payment method, or None if not found
 
         Raises:
             Exception: If database operation fails
         """
         try:
             cursor.execute(
-                """
-                UPDATE medios_pago
-                SET eliminado = TRUE, activo = FALSE, updated_by = %s
-                WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                """,
-                (user_id, medio_pago_id, negocio_id)
+                _SELECT_MEDIO_PAGO_FOR_DELETE_SQL,
+                (medio_pago_id, negocio_id)
             )
-            rows_affected = cursor.rowcount
+            row = cursor.fetchone()
 
-            if rows_affected > 0:
-                logger.info(
-                    f"Payment method soft deleted in MariaDB: "
-                    f"id={medio_pago_id}, negocio_id={negocio_id}"
-                )
-                return True
-            else:
+            if row is None:
                 logger.warning(
                     f"Payment method not found for deletion: "
                     f"id={medio_pago_id}, negocio_id={negocio_id}"
                 )
-                return False
+                return None
+
+            cursor.execute(
+                _DELETE_MEDIO_PAGO_SQL,
+                (user_id, medio_pago_id, negocio_id)
+            )
+            logger.info(
+                f"Payment method soft deleted in MariaDB: "
+                f"id={medio_pago_id}, negocio_id={negocio_id}"
+            )
+            return row['descripcion']
 
         except Exception as e:
             logger.error(f"Error deleting payment method in MariaDB: {str(e)}")
@@ -391,29 +596,11 @@ class MedioPagoService:
             List of active payment methods
         """
         cursor.execute(
-            """
-            SELECT descripcion, nombre_titular, numero_cuenta
-            FROM medios_pago
-            WHERE negocio_id = %s AND eliminado = FALSE AND activo = TRUE
-            ORDER BY descripcion
-            """,
+            _SELECT_ACTIVE_MEDIOS_PAGO_SQL,
             (negocio_id,)
         )
-        results = cursor.fetchall()
-
-        # Convert to list of dictionaries
-        payment_methods = []
-        for row in results:
-            if isinstance(row, tuple):
-                payment_methods.append({
-                    'descripcion': row[0],
-                    'nombre_titular': row[1],
-                    'numero_cuenta': row[2]
-                })
-            else:
-                payment_methods.append(row)
-
-        return payment_methods
+        # Cursor is opened with dictionary=True, rows are already dicts
+        return cursor.fetchall()
 
 
 # Dependency injection helper
@@ -3,17 +3,102 @@ Service layer for promocion (promotions) management.
 Handles transaction logic between MariaDB and Firestore.
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from decimal import Decimal
 from datetime import date
 from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.field_path import FieldPath
+import hashlib
+import json
 import logging
+import time
 import mysql.connector
-from app.services.firestore_service import FirestoreService
+from app.config import settings
+from app.services.firestore_service import FirestoreService, FIRESTORE_BATCH_LIMIT, cached_doc_ref
 
 
 logger = logging.getLogger(__name__)
 
+# Sentinel resolved once instead of through the firebase_admin facade on every write
+_SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+
+
+def _promocion_path(promocion_id: int) -> str:
+    """
+    Field path of a promotion's entry in the negocio 'promociones' map for update().
+    The numeric ID is not a valid bare path segment; FieldPath backtick-quotes it.
+
+    Args:
+        promocion_id: Promotion ID
+
+    Returns:
+        Field path string (e.g., "promociones.`123`")
+    """
+    return FieldPath('promociones', str(promocion_id)).to_api_repr()
+
+
+# SHA-1 of the last document written per promocion_id: (digest, expires_at)
+_SYNC_HASH_TTL = 300
+_last_sync_hash: Dict[int, Tuple[bytes, float]] = {}
+
+# Optional fields of update_promocion_with_transaction; bit i of the mask is field i
+_UPDATE_FIELDS = (
+    'titulo', 'descripcion', 'tipo_descuento', 'valor_descuento',
+    'fecha_inicio', 'fecha_fin', 'activo'
+)
+
+# UPDATE statement for every combination of provided fields, keyed by bitmask.
+# valor_descuento comes back as float from MariaDB; the dates stay DATE (datetime.date).
+# MariaDB has no UPDATE ... RETURNING: the UPDATE and the read-back SELECT are
+# sent as one multi-statement batch (one round-trip). The SELECT uses the same
+# predicate, so no row means not found.
+_UPDATE_TEMPLATES = {
+    mask: f"""
+        UPDATE promociones
+        SET {', '.join([f'{field} = %s' for bit, field in enumerate(_UPDATE_FIELDS) if mask & (1 << bit)] + ['updated_by = %s'])}
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE;
+        SELECT
+            id, negocio_id, titulo, descripcion, tipo_descuento,
+            CAST(valor_descuento AS DOUBLE) AS valor_descuento,
+            fecha_inicio,
+            fecha_fin,
+            activo, eliminado, created_at, updated_at, created_by, updated_by
+        FROM promociones
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
+    """
+    for mask in range(1 << len(_UPDATE_FIELDS))
+}
+
+# Fixed statements, built once at import so every call sends identical text
+_INSERT_PROMOCION_SQL = """
+    INSERT INTO promociones
+        (negocio_id, titulo, descripcion, tipo_descuento, valor_descuento,
+         fecha_inicio, fecha_fin, activo, created_by)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    RETURNING
+        id,
+        negocio_id,
+        titulo,
+        descripcion,
+        tipo_descuento,
+        CAST(valor_descuento AS DOUBLE) AS valor_descuento,
+        fecha_inicio,
+        fecha_fin,
+        activo,
+        eliminado,
+        created_at,
+        updated_at,
+        created_by,
+        updated_by
+"""
+
+_DELETE_PROMOCION_SQL = """
+    UPDATE promociones
+    SET eliminado = TRUE, updated_by = %s
+    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
+"""
+
 
 class PromocionService:
     """Service for managing promotions with dual persistence (MariaDB + Firestore)"""
@@ -21,6 +106,33 @@ class PromocionService:
     def __init__(self, firestore_service: FirestoreService):
         self.firestore_service = firestore_service
         self.db = firestore_service.db
+        self.async_db = firestore_service.async_db
+
+    def _build_promocion_doc(self, promocion: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the Firestore document for a promotion.
+
+        Args:
+            promocion: Promotion dictionary with all fields
+
+        Returns:
+            Document data with Decimal/date values converted for Firestore
+        """
+        get = promocion.get
+
+        # Single dict build: Decimal -> float and date -> ISO string inline
+        return {
+            'id': get('id'),
+            'negocio_id': get('negocio_id'),
+            'titulo': get('titulo', ''),
+            'descripcion': get('descripcion', ''),
+            'tipo_descuento': get('tipo_descuento', 'porcentaje'),
+            'valor_descuento': float(v) if isinstance(v := get('valor_descuento', 0), Decimal) else v,
+            'fecha_inicio': fi.isoformat() if isinstance(fi := get('fecha_inicio'), date) else fi,
+            'fecha_fin': ff.isoformat() if isinstance(ff := get('fecha_fin'), date) else ff,
+            'activo': get('activo', True),
+            'updated_at': _SERVER_TIMESTAMP
+        }
 
     async def sync_promocion_to_firestore(
         self,
@@ -28,7 +140,9 @@ class PromocionService:
     ) -> None:
         """
         Sync a single promotion to Firestore.
-        Stores in 'promociones' collection with promocion ID as document ID.
+        Stores in 'promociones' collection with promocion ID as document ID, or,
+        with FIRESTORE_PROMOCIONES_IN_NEGOCIO, under the 'promociones' map of the
+        negocios/{negocio_id} document (the same document that holds medios_pago).
 
         Args:
             promocion: Promotion dictionary with all fields
@@ -41,56 +155,124 @@ class PromocionService:
             if not promocion_id:
                 raise ValueError("Promotion ID is required for Firestore sync")
 
-            # Convert Decimal to float for Firestore
-            valor_descuento = promocion.get('valor_descuento', 0)
-            if isinstance(valor_descuento, Decimal):
-                valor_descuento = float(valor_descuento)
-
-            # Convert date to string for Firestore
-            fecha_inicio = promocion.get('fecha_inicio')
-            if isinstance(fecha_inicio, date):
-                fecha_inicio = fecha_inicio.isoformat()
-
-            fecha_fin = promocion.get('fecha_fin')
-            if isinstance(fecha_fin, date):
-                fecha_fin = fecha_fin.isoformat()
-
-            # Prepare document data
-            doc_data = {
-                'id': promocion_id,
-                'negocio_id': promocion.get('negocio_id'),
-                'titulo': promocion.get('titulo', ''),
-                'descripcion': promocion.get('descripcion', ''),
-                'tipo_descuento': promocion.get('tipo_descuento', 'porcentaje'),
-                'valor_descuento': valor_descuento,
-                'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin,
-                'activo': promocion.get('activo', True),
-                'updated_at': firestore.SERVER_TIMESTAMP
-            }
+            doc_data = self._build_promocion_doc(promocion)
+
+            # Skip the write when this promotion was last synced with the same content
+            payload_hash = hashlib.sha1(
+                json.dumps(
+                    {k: v for k, v in doc_data.items() if k != 'updated_at'},
+                    sort_keys=True,
+                    default=str
+                ).encode()
+            ).digest()
+            cached = _last_sync_hash.get(promocion_id)
+            if cached and cached[0] == payload_hash and cached[1] > time.monotonic():
+                logger.info(f"Promotion {promocion_id} unchanged, skipping Firestore sync")
+                return
 
             logger.info(f"Syncing promotion {promocion_id} to Firestore")
 
-            # Update Firestore document in 'promociones' collection
-            # Use promocion_id as the document ID
-            doc_ref = self.db.collection('promociones').document(str(promocion_id))
-            doc_ref.set(doc_data, merge=True)
+            if settings.FIRESTORE_PROMOCIONES_IN_NEGOCIO:
+                # Only this promotion's entry is written (quoted field path)
+                doc_ref = cached_doc_ref(self.async_db, 'negocios', doc_data['negocio_id'])
+                try:
+                    await doc_ref.update({
+                        _promocion_path(promocion_id): doc_data,
+                        'updated_at': _SERVER_TIMESTAMP
+                    })
+                except NotFound:
+                    logger.info(f"Document not found for negocio_id {doc_data['negocio_id']}, creating new document")
+                    await doc_ref.set({
+                        'promociones': {str(promocion_id): doc_data},
+                        'updated_at': _SERVER_TIMESTAMP
+                    })
+            else:
+                # Update Firestore document in 'promociones' collection
+                # Use promocion_id as the document ID
+                doc_ref = self.async_db.collection('promociones').document(str(promocion_id))
+                await doc_ref.set(doc_data, merge=True)
 
+            _last_sync_hash[promocion_id] = (payload_hash, time.monotonic() + _SYNC_HASH_TTL)
             logger.info(f"Firestore sync successful for promocion_id {promocion_id}")
 
         except Exception as e:
+            _last_sync_hash.pop(promocion.get('id'), None)
             logger.error(f"Firestore sync failed for promocion: {str(e)}")
             raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
 
+    async def sync_many_promociones_to_firestore(
+        self,
+        promociones: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Sync several promotions to Firestore using batched writes.
+        Each commit carries up to FIRESTORE_BATCH_LIMIT documents (one RPC per chunk).
+
+        Args:
+            promociones: List of promotion dictionaries with all fields
+
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            logger.info(f"Batch syncing {len(promociones)} promotions to Firestore")
+
+            if settings.FIRESTORE_PROMOCIONES_IN_NEGOCIO:
+                # One merged write per negocio document carrying all its promotions
+                por_negocio: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+                for promocion in promociones:
+                    promocion_id = promocion.get('id')
+                    if not promocion_id:
+                        raise ValueError("Promotion ID is required for Firestore sync")
+                    por_negocio.setdefault(promocion.get('negocio_id'), {})[str(promocion_id)] = \
+                        self._build_promocion_doc(promocion)
+
+                items = list(por_negocio.items())
+                for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                    batch = self.async_db.batch()
+                    for negocio_id, docs in items[start:start + FIRESTORE_BATCH_LIMIT]:
+                        batch.set(
+                            cached_doc_ref(self.async_db, 'negocios', negocio_id),
+                            {'promociones': docs, 'updated_at': _SERVER_TIMESTAMP},
+                            merge=True
+                        )
+                    await batch.commit()
+            else:
+                for start in range(0, len(promociones), FIRESTORE_BATCH_LIMIT):
+                    batch = self.async_db.batch()
+                    for promocion in promociones[start:start + FIRESTORE_BATCH_LIMIT]:
+                        promocion_id = promocion.get('id')
+                        if not promocion_id:
+                            raise ValueError("Promotion ID is required for Firestore sync")
+
+                        batch.set(
+                            self.async_db.collection('promociones').document(str(promocion_id)),
+                            self._build_promocion_doc(promocion),
+                            merge=True
+                        )
+                    await batch.commit()
+
+            # Batched writes bypass the per-promotion hash; forget what we had
+            for promocion in promociones:
+                _last_sync_hash.pop(promocion.get('id'), None)
+
+            logger.info(f"Firestore batch sync successful for {len(promociones)} promotions")
+
+        except Exception as e:
+            logger.error(f"Firestore batch sync failed for promociones: {str(e)}")
+            raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
+
     async def delete_promocion_from_firestore(
         self,
-        promocion_id: int
+        promocion_id: int,
+        negocio_id: Optional[int] = None
     ) -> None:
         """
         Delete a promotion from Firestore.
 
         Args:
             promocion_id: Promotion ID
+            negocio_id: Business ID (required with FIRESTORE_PROMOCIONES_IN_NEGOCIO)
 
         Raises:
             Exception: If Firestore operation fails
@@ -98,9 +280,23 @@ class PromocionService:
         try:
             logger.info(f"Deleting promotion {promocion_id} from Firestore")
 
-            # Delete Firestore document
-            doc_ref = self.db.collection('promociones').document(str(promocion_id))
-            doc_ref.delete()
+            if settings.FIRESTORE_PROMOCIONES_IN_NEGOCIO:
+                if negocio_id is None:
+                    raise ValueError("Business ID is required to delete a promotion from Firestore")
+                # Remove only this promotion's entry from the negocio document
+                doc_ref = cached_doc_ref(self.async_db, 'negocios', negocio_id)
+                try:
+                    await doc_ref.update({
+                        _promocion_path(promocion_id): firestore.DELETE_FIELD,
+                        'updated_at': _SERVER_TIMESTAMP
+                    })
+                except NotFound:
+                    logger.info(f"Document not found for negocio_id {negocio_id}, nothing to delete")
+            else:
+                # Delete Firestore document
+                doc_ref = self.async_db.collection('promociones').document(str(promocion_id))
+                await doc_ref.delete()
+            _last_sync_hash.pop(promocion_id, None)
 
             logger.info(f"Firestore delete successful for promocion_id {promocion_id}")
 
@@ -148,57 +344,19 @@ class PromocionService:
             # Convert Decimal to float to ensure proper precision in MariaDB
             valor_descuento_float = float(valor_descuento) if isinstance(valor_descuento, Decimal) else valor_descuento
 
+            # RETURNING (MariaDB 10.5+) gives back the created row in the same round-trip,
+            # with valor_descuento cast to float and the dates as DATE (datetime.date)
             cursor.execute(
-                """
-                INSERT INTO promociones
-                    (negocio_id, titulo, descripcion, tipo_descuento, valor_descuento,
-                     fecha_inicio, fecha_fin, activo, created_by)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
+                _INSERT_PROMOCION_SQL,
                 (negocio_id, titulo, descripcion, tipo_descuento, valor_descuento_float,
                  fecha_inicio, fecha_fin, activo, user_id)
             )
-
-            promocion_id = cursor.lastrowid
-
-            # Get the created record
-            cursor.execute(
-                """
-                SELECT
-                    id,
-                    negocio_id,
-                    titulo,
-                    descripcion,
-                    tipo_descuento,
-                    valor_descuento,
-                    fecha_inicio,
-                    fecha_fin,
-                    activo,
-                    eliminado,
-                    created_at,
-                    updated_at,
-                    created_by,
-                    updated_by
-                FROM promociones
-                WHERE id = %s
-                """,
-                (promocion_id,)
-            )
             result = cursor.fetchone()
 
             if not result:
                 raise Exception("Failed to retrieve created promotion")
 
-            # Convert tuple to dictionary (if cursor is not dictionary=True)
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
-            # Convert Decimal to float
-            if result.get('valor_descuento') is not None:
-                result['valor_descuento'] = float(result['valor_descuento'])
-
-            logger.info(f"Promotion created in MariaDB: id={promocion_id}, negocio_id={negocio_id}")
+            logger.info(f"Promotion created in MariaDB: id={result['id']}, negocio_id={negocio_id}")
             return result
 
         except Exception as e:
@@ -244,100 +402,30 @@ class PromocionService:
             Exception: If database operation fails
         """
         try:
-            # Build dynamic update query
-            update_fields = []
+            # Convert Decimal to float to ensure proper precision
+            if isinstance(valor_descuento, Decimal):
+                valor_descuento = float(valor_descuento)
+
+            # Pick the precomputed UPDATE for the set of provided fields
+            mask = 0
             params = []
+            for bit, value in enumerate((titulo, descripcion, tipo_descuento, valor_descuento,
+                                         fecha_inicio, fecha_fin, activo)):
+                if value is not None:
+                    mask |= 1 << bit
+                    params.append(value)
 
-            if titulo is not None:
-                update_fields.append("titulo = %s")
-                params.append(titulo)
-
-            if descripcion is not None:
-                update_fields.append("descripcion = %s")
-                params.append(descripcion)
-
-            if tipo_descuento is not None:
-                update_fields.append("tipo_descuento = %s")
-                params.append(tipo_descuento)
-
-            if valor_descuento is not None:
-                update_fields.append("valor_descuento = %s")
-                # Convert Decimal to float to ensure proper precision
-                valor_descuento_float = float(valor_descuento) if isinstance(valor_descuento, Decimal) else valor_descuento
-                params.append(valor_descuento_float)
-
-            if fecha_inicio is not None:
-                update_fields.append("fecha_inicio = %s")
-                params.append(fecha_inicio)
-
-            if fecha_fin is not None:
-                update_fields.append("fecha_fin = %s")
-                params.append(fecha_fin)
-
-            if activo is not None:
-                update_fields.append("activo = %s")
-                params.append(activo)
-
-            # Always update updated_by
-            update_fields.append("updated_by = %s")
-            params.append(user_id)
-
-            if not update_fields:
-                # No fields to update, just return current record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, titulo, descripcion, tipo_descuento,
-                        valor_descuento, fecha_inicio, fecha_fin, activo, eliminado,
-                        created_at, updated_at, created_by, updated_by
-                    FROM promociones
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                    """,
-                    (promocion_id, negocio_id)
-                )
-                result = cursor.fetchone()
-            else:
-                # Add WHERE clause parameters
-                params.extend([promocion_id, negocio_id])
-
-                query = f"""
-                    UPDATE promociones
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                """
-
-                cursor.execute(query, params)
-                rows_affected = cursor.rowcount
-
-                if rows_affected == 0:
-                    return None
-
-                # Get the updated record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, titulo, descripcion, tipo_descuento,
-                        valor_descuento, fecha_inicio, fecha_fin, activo, eliminado,
-                        created_at, updated_at, created_by, updated_by
-                    FROM promociones
-                    WHERE id = %s
-                    """,
-                    (promocion_id,)
-                )
-                result = cursor.fetchone()
+            # updated_by is always set, then the UPDATE and read-back SELECT predicates
+            params.extend([user_id, promocion_id, negocio_id, promocion_id, negocio_id])
+
+            result = None
+            for stmt_cursor in cursor.execute(_UPDATE_TEMPLATES[mask], params, multi=True):
+                if stmt_cursor.with_rows:
+                    result = stmt_cursor.fetchone()
 
             if not result:
                 return None
 
-            # Convert tuple to dictionary
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
-            # Convert Decimal to float
-            if result.get('valor_descuento') is not None:
-                result['valor_descuento'] = float(result['valor_descuento'])
-
             logger.info(f"Promotion updated in MariaDB: id={promocion_id}, negocio_id={negocio_id}")
             return result
 
@@ -371,11 +459,7 @@ class PromocionService:
         """
         try:
             cursor.execute(
-                """
-                UPDATE promociones
-                SET eliminado = TRUE, updated_by = %s
-                WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                """,
+                _DELETE_PROMOCION_SQL,
                 (user_id, promocion_id, negocio_id)
             )
             rows_affected = cursor.rowcount
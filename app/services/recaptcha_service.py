@@ -4,12 +4,50 @@
 
 """Servicio para verificar Google reCAPTCHA"""
 import httpx
+import orjson
+from collections import OrderedDict
 from typing import Any, Dict, Optional
+from urllib.parse import quote_plus
 from app.config import settings
+import hashlib
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Solo se cachean los rechazos de Google: un token inválido no vuelve a
+# consultarse. Un éxito nunca se reutiliza (permitiría repetir un token ya
+# resuelto, justo lo que evita el 'timeout-or-duplicate' de Google)
+_VERIFY_CACHE_TTL = 120  # seconds
+_VERIFY_CACHE_MAX = 1024
+
+# El cuerpo se envía ya codificado como formulario
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# Cliente HTTP compartido: mantiene viva la conexión TLS con Google entre verificaciones
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client(timeout: float) -> httpx.AsyncClient:
+    """Obtener (o crear) el cliente HTTP compartido para siteverify"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Cerrar el cliente HTTP compartido (llamar en el shutdown de la aplicación)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 class RecaptchaService:
     """Servicio para validar reCAPTCHA de Google"""
     
@@ -17,6 +55,23 @@ class RecaptchaService:
         self.secret_key = settings.RECAPTCHA_SECRET_KEY
         self.verify_url = "https://www.google.com/recaptcha/api/siteverify"
         self.timeout = 10.0  # seconds
+        # 'secret=...' codificado una sola vez; cada petición solo añade token e IP
+        self._secret_prefix = f"secret={quote_plus(self.secret_key or '')}".encode()
+        # sha256(token|ip) -> expires_at de tokens rechazados, en orden de inserción
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        # La clave no cambia tras la construcción: estado calculado una sola vez
+        self._enabled = (
+            bool(self.secret_key) and 
+            self.secret_key.strip() != "" and
+            self.secret_key != "TU_CLAVE_RECAPTCHA" and
+            len(self.secret_key) > 10  # Las claves de Google son largas
+        )
+        self._status = {
+            "enabled": self._enabled,
+            "secret_key_configured": bool(self.secret_key and len(self.secret_key) > 5),
+            "api_url": self.verify_url,
+            "timeout": self.timeout
+        }
     
     async def verify_token(
         self, 
@@ -39,78 +94,98 @@ class RecaptchaService:
             logger.warning("reCAPTCHA verification called but service is disabled")
             return True
         
-        if not token or len(token.strip()) == 0:
+        stripped = token.strip() if token else ''
+        if not stripped:
             logger.warning("Empty reCAPTCHA token provided")
             return False
         
+        cache_key = hashlib.sha256(f"{stripped}|{ip_address}".encode()).hexdigest()
+        expires_at = self._cache.get(cache_key)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                logger.debug("reCAPTCHA token already rejected (cached)")
+                return False
+            del self._cache[cache_key]
+
         try:
             # Preparar datos para la API
-            data = {
-                'secret': self.secret_key,
-                'response': token.strip(),
-                'remoteip': ip_address
-            }
+            body = (
+                self._secret_prefix
+                + b"&response=" + quote_plus(stripped).encode()
+                + b"&remoteip=" + quote_plus(ip_address or '').encode()
+            )
             
-            # Realizar request a Google API
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(self.verify_url, data=data)
-                
-                if response.status_code != 200:
-                    logger.error(f"reCAPTCHA API returned status {response.status_code}")
-                    return False
+            # Realizar request a Google API (conexión reutilizada)
+            response = await _get_http_client(self.timeout).post(
+                self.verify_url, content=body, headers=_FORM_HEADERS
+            )
+
+            if response.status_code != 200:
+                logger.error("reCAPTCHA API returned status %s", response.status_code)
+                return False
+            
+            # orjson parsea los bytes directamente (sin detección de charset ni str intermedio)
+            result = orjson.loads(response.content)
+            
+            # Verificar respuesta básica
+            success = result.get('success', False)
+            
+            if not success:
+                self._remember_rejected(cache_key)
+                error_codes = result.get('error-codes', [])
+                logger.warning("reCAPTCHA verification failed: %s", error_codes)
                 
-                result = response.json()
+                # Algunos errores específicos
+                if 'timeout-or-duplicate' in error_codes:
+                    logger.warning("reCAPTCHA token already used or expired")
+                elif 'invalid-input-response' in error_codes:
+                    logger.warning("Invalid reCAPTCHA token format")
                 
-                # Verificar respuesta básica
-                success = result.get('success', False)
+                return False
+            
+            # reCAPTCHA v3 - verificar score si está disponible
+            score = result.get('score')
+            if score is not None:
+                logger.debug("reCAPTCHA score: %s", score)
                 
-                if not success:
-                    error_codes = result.get('error-codes', [])
-                    logger.warning(f"reCAPTCHA verification failed: {error_codes}")
-                    
-                    # Algunos errores específicos
-                    if 'timeout-or-duplicate' in error_codes:
-                        logger.warning("reCAPTCHA token already used or expired")
-                    elif 'invalid-input-response' in error_codes:
-                        logger.warning("Invalid reCAPTCHA token format")
-                    
+                if score < min_score:
+                    logger.warning("reCAPTCHA score %s below minimum %s", score, min_score)
                     return False
-                
-                # reCAPTCHA v3 - verificar score si está disponible
-                score = result.get('score')
-                if score is not None:
-                    logger.debug(f"reCAPTCHA score: {score}")
-                    
-                    if score < min_score:
-                        logger.warning(f"reCAPTCHA score {score} below minimum {min_score}")
-                        return False
-                
+            
+            if logger.isEnabledFor(logging.DEBUG):
                 # Verificar acción si está disponible (reCAPTCHA v3)
                 action = result.get('action')
                 if action:
-                    logger.debug(f"reCAPTCHA action: {action}")
+                    logger.debug("reCAPTCHA action: %s", action)
                 
                 # Verificar hostname si está disponible
                 hostname = result.get('hostname')
                 if hostname:
-                    logger.debug(f"reCAPTCHA hostname: {hostname}")
-                
-                logger.info(f"reCAPTCHA verification successful for IP {ip_address}")
-                return True
-                
+                    logger.debug("reCAPTCHA hostname: %s", hostname)
+            
+            logger.info("reCAPTCHA verification successful for IP %s", ip_address)
+            return True
+            
         except httpx.TimeoutException:
             logger.error("reCAPTCHA verification timeout")
             return False
         except httpx.RequestError as e:
-            logger.error(f"reCAPTCHA verification network error: {e}")
+            logger.error("reCAPTCHA verification network error: %s", e)
             return False
         except ValueError as e:
-            logger.error(f"reCAPTCHA verification JSON parse error: {e}")
+            logger.error("reCAPTCHA verification JSON parse error: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected reCAPTCHA verification error: {e}")
+            logger.error("Unexpected reCAPTCHA verification error: %s", e)
             return False
     
+    def _remember_rejected(self, cache_key: str) -> None:
+        """Guardar un token rechazado por Google, descartando los más antiguos si se supera el límite"""
+        self._cache[cache_key] = time.monotonic() + _VERIFY_CACHE_TTL
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > _VERIFY_CACHE_MAX:
+            self._cache.popitem(last=False)
+    
     def is_enabled(self) -> bool:
         """
         Verificar si reCAPTCHA está habilitado y configurado
@@ -118,12 +193,7 @@ class RecaptchaService:
         Returns:
             True si está habilitado y configurado correctamente
         """
-        return (
-            bool(self.secret_key) and 
-            self.secret_key.strip() != "" and
-            self.secret_key != "TU_CLAVE_RECAPTCHA" and
-            len(self.secret_key) > 10  # Las claves de Google son largas
-        )
+        return self._enabled
     
     def get_status(self) -> Dict[str, Any]:
         """
@@ -132,9 +202,4 @@ class RecaptchaService:
         Returns:
             Dict con información del estado del servicio
         """
-        return {
-            "enabled": self.is_enabled(),
-            "secret_key_configured": bool(self.secret_key and len(self.secret_key) > 5),
-            "api_url": self.verify_url,
-            "timeout": self.timeout
-        }
\ No newline at end of file
+        return dict(self._status)
\ No newline at end of file
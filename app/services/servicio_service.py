@@ -5,14 +5,63 @@ Handles transaction logic between MariaDB and Firestore.
 
 from typing import Dict, Any, Optional, List
 from decimal import Decimal
+from functools import lru_cache, partial
 from firebase_admin import firestore
 import logging
+import re
 import mysql.connector
-from app.services.firestore_service import FirestoreService
+from app.services.firestore_service import FirestoreService, FIRESTORE_BATCH_LIMIT, cached_doc_ref
 
 
 logger = logging.getLogger(__name__)
 
+# Runs of non-alphanumeric characters (underscore included) in service names
+_NON_ALNUM_RUN = re.compile(r'[\W_]+')
+
+# Fields replaced as a whole when syncing services with set(merge=...)
+_PRECIOS_FIELDS = ['precios_cita', 'updated_at']
+
+# Optional fields of update_servicio_with_transaction; bit i of the mask is field i
+_UPDATE_FIELDS = ('nombre', 'descripcion', 'duracion_minutos', 'precio', 'activo')
+
+# UPDATE statement for every combination of provided fields, keyed by bitmask.
+# MariaDB has no UPDATE ... RETURNING: the UPDATE and the read-back SELECT are
+# sent as one multi-statement batch (one round-trip). The SELECT uses the same
+# predicate, so no row means not found.
+_UPDATE_TEMPLATES = {
+    mask: f"""
+        UPDATE servicios
+        SET {', '.join([f'{field} = %s' for bit, field in enumerate(_UPDATE_FIELDS) if mask & (1 << bit)] + ['updated_by = %s'])}
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE;
+        SELECT
+            id, negocio_id, nombre, descripcion, duracion_minutos,
+            precio, activo, eliminado, created_at, updated_at,
+            created_by, updated_by
+        FROM servicios
+        WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
+    """
+    for mask in range(1 << len(_UPDATE_FIELDS))
+}
+
+
+@lru_cache(maxsize=1024)
+def _normalize_service_name_for_firestore(nombre: str) -> str:
+    """
+    Convert service name to lowercase with underscores for Firestore key.
+    Cached: the same names come back on every sync.
+
+    Args:
+        nombre: Service name (e.g., "Consulta General")
+
+    Returns:
+        Normalized name (e.g., "consulta_general")
+    """
+    # Replace each run of spaces/special characters/underscores with a single
+    # underscore (alphanumerics, including accented letters, are kept)
+    normalized = _NON_ALNUM_RUN.sub('_', nombre.strip().lower())
+    # Remove leading/trailing underscores
+    return normalized.strip('_')
+
 
 class ServicioService:
     """Service for managing services with dual persistence (MariaDB + Firestore)"""
@@ -21,27 +70,6 @@ class ServicioService:
         self.firestore_service = firestore_service
         self.db = firestore_service.db
 
-    def _normalize_service_name_for_firestore(self, nombre: str) -> str:
-        """
-        Convert service name to lowercase with underscores for Firestore key.
-
-        Args:
-            nombre: Service name (e.g., "Consulta General")
-
-        Returns:
-            Normalized name (e.g., "consulta_general")
-        """
-        # Replace spaces with underscores and convert to lowercase
-        normalized = nombre.strip().lower().replace(' ', '_')
-        # Remove special characters (keep only alphanumeric and underscores)
-        normalized = ''.join(c if c.isalnum() or c == '_' else '_' for c in normalized)
-        # Replace multiple consecutive underscores with single underscore
-        while '__' in normalized:
-            normalized = normalized.replace('__', '_')
-        # Remove leading/trailing underscores
-        normalized = normalized.strip('_')
-        return normalized
-
     async def sync_all_services_to_firestore(
         self,
         negocio_id: int,
@@ -59,47 +87,77 @@ class ServicioService:
             Exception: If Firestore operation fails
         """
         try:
-            # Build precios_cita dictionary
-            precios_cita = {}
-            for servicio in servicios:
-                nombre = servicio.get('nombre', '')
-                precio = servicio.get('precio', 0)
-
-                # Convert to float if it's a Decimal
-                if isinstance(precio, Decimal):
-                    precio = float(precio)
+            # Build precios_cita dictionary (precio already comes back as float)
+            precios_cita = {
+                _normalize_service_name_for_firestore(servicio.get('nombre', '')): servicio.get('precio', 0)
+                for servicio in servicios
+            }
 
-                # Normalize service name for Firestore key
-                key = self._normalize_service_name_for_firestore(nombre)
-                precios_cita[key] = precio
-
-            logger.info(f"Syncing {len(precios_cita)} services to Firestore for negocio_id {negocio_id}")
+            logger.info("Syncing %s services to Firestore for negocio_id %s", len(precios_cita), negocio_id)
 
             # Update Firestore document in 'negocios' collection
-            doc_ref = self.db.collection('negocios').document(str(negocio_id))
-
-            # Use update() to REPLACE the entire precios_cita field
-            # This ensures deleted services are removed from Firestore
-            try:
-                doc_ref.update({
-                    'precios_cita': precios_cita,
-                    'updated_at': firestore.SERVER_TIMESTAMP
-                })
-            except Exception as e:
-                # If document doesn't exist, create it with set()
-                if 'NOT_FOUND' in str(e) or 'not found' in str(e).lower():
-                    logger.info(f"Document not found for negocio_id {negocio_id}, creating new document")
-                    doc_ref.set({
+            doc_ref = cached_doc_ref(self.db, 'negocios', negocio_id)
+
+            # set() with a field mask REPLACES the entire precios_cita field (deleted
+            # services are removed) and creates the document if missing, in one RPC
+            # Blocking SDK call runs on the shared Firestore executor, not the event loop
+            await self.firestore_service.run_blocking(
+                partial(
+                    doc_ref.set,
+                    {
                         'precios_cita': precios_cita,
                         'updated_at': firestore.SERVER_TIMESTAMP
-                    })
-                else:
-                    raise
+                    },
+                    merge=_PRECIOS_FIELDS
+                )
+            )
+
+            logger.info("Firestore sync successful for negocio_id %s", negocio_id)
+
+        except Exception as e:
+            logger.error("Firestore sync failed for negocio_id %s: %s", negocio_id, e)
+            raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
+
+    async def sync_many_services_to_firestore(
+        self,
+        negocio_servicios: Dict[int, List[Dict[str, Any]]]
+    ) -> None:
+        """
+        Sync services for several businesses to Firestore using batched writes.
+        Each commit carries up to FIRESTORE_BATCH_LIMIT documents (one RPC per chunk).
+
+        'precios_cita' is replaced as a whole field, as in sync_all_services_to_firestore.
+
+        Args:
+            negocio_servicios: Map of business ID to its list of service dictionaries
 
-            logger.info(f"Firestore sync successful for negocio_id {negocio_id}")
+        Raises:
+            Exception: If Firestore operation fails
+        """
+        try:
+            logger.info("Batch syncing services to Firestore for %s negocios", len(negocio_servicios))
+
+            items = list(negocio_servicios.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                batch = self.db.batch()
+                for negocio_id, servicios in items[start:start + FIRESTORE_BATCH_LIMIT]:
+                    batch.set(
+                        cached_doc_ref(self.db, 'negocios', negocio_id),
+                        {
+                            'precios_cita': {
+                                _normalize_service_name_for_firestore(servicio.get('nombre', '')): servicio.get('precio', 0)
+                                for servicio in servicios
+                            },
+                            'updated_at': firestore.SERVER_TIMESTAMP
+                        },
+                        merge=_PRECIOS_FIELDS
+                    )
+                await self.firestore_service.run_blocking(batch.commit)
+
+            logger.info("Firestore batch sync successful for %s negocios", len(negocio_servicios))
 
         except Exception as e:
-            logger.error(f"Firestore sync failed for negocio_id {negocio_id}: {str(e)}")
+            logger.error("Firestore batch sync failed for services: %s", e)
             raise Exception(f"Error al sincronizar con Firestore: {str(e)}")
 
     async def create_servicio_with_transaction(
@@ -136,21 +194,13 @@ class ServicioService:
             Exception: If database operation fails
         """
         try:
+            # RETURNING (MariaDB 10.5+) gives back the created row in the same round-trip
             cursor.execute(
                 """
                 INSERT INTO servicios
                     (negocio_id, nombre, descripcion, duracion_minutos, precio, activo, created_by)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                (negocio_id, nombre, descripcion, duracion_minutos, precio, activo, user_id)
-            )
-
-            servicio_id = cursor.lastrowid
-
-            # Get the created record
-            cursor.execute(
-                """
-                SELECT
+                RETURNING
                     id,
                     negocio_id,
                     nombre,
@@ -163,30 +213,23 @@ class ServicioService:
                     updated_at,
                     created_by,
                     updated_by
-                FROM servicios
-                WHERE id = %s
                 """,
-                (servicio_id,)
+                (negocio_id, nombre, descripcion, duracion_minutos, precio, activo, user_id)
             )
             result = cursor.fetchone()
 
             if not result:
                 raise Exception("Failed to retrieve created service")
 
-            # Convert tuple to dictionary (if cursor is not dictionary=True)
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
             # Convert Decimal to float
             if result.get('precio') is not None:
                 result['precio'] = float(result['precio'])
 
-            logger.info(f"Service created in MariaDB: id={servicio_id}, negocio_id={negocio_id}")
+            logger.info("Service created in MariaDB: id=%s, negocio_id=%s", result['id'], negocio_id)
             return result
 
         except Exception as e:
-            logger.error(f"Error creating service in MariaDB: {str(e)}")
+            logger.error("Error creating service in MariaDB: %s", e)
             raise
 
     async def update_servicio_with_transaction(
@@ -224,95 +267,34 @@ class ServicioService:
             Exception: If database operation fails
         """
         try:
-            # Build dynamic update query
-            update_fields = []
+            # Pick the precomputed UPDATE for the set of provided fields
+            mask = 0
             params = []
+            for bit, value in enumerate((nombre, descripcion, duracion_minutos, precio, activo)):
+                if value is not None:
+                    mask |= 1 << bit
+                    params.append(value)
 
-            if nombre is not None:
-                update_fields.append("nombre = %s")
-                params.append(nombre)
-
-            if descripcion is not None:
-                update_fields.append("descripcion = %s")
-                params.append(descripcion)
-
-            if duracion_minutos is not None:
-                update_fields.append("duracion_minutos = %s")
-                params.append(duracion_minutos)
-
-            if precio is not None:
-                update_fields.append("precio = %s")
-                params.append(precio)
-
-            if activo is not None:
-                update_fields.append("activo = %s")
-                params.append(activo)
-
-            # Always update updated_by
-            update_fields.append("updated_by = %s")
-            params.append(user_id)
-
-            if not update_fields:
-                # No fields to update, just return current record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, nombre, descripcion, duracion_minutos,
-                        precio, activo, eliminado, created_at, updated_at,
-                        created_by, updated_by
-                    FROM servicios
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                    """,
-                    (servicio_id, negocio_id)
-                )
-                result = cursor.fetchone()
-            else:
-                # Add WHERE clause parameters
-                params.extend([servicio_id, negocio_id])
+            # updated_by is always set, then the UPDATE and read-back SELECT predicates
+            params.extend([user_id, servicio_id, negocio_id, servicio_id, negocio_id])
 
-                query = f"""
-                    UPDATE servicios
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s AND negocio_id = %s AND eliminado = FALSE
-                """
-
-                cursor.execute(query, params)
-                rows_affected = cursor.rowcount
-
-                if rows_affected == 0:
-                    return None
-
-                # Get the updated record
-                cursor.execute(
-                    """
-                    SELECT
-                        id, negocio_id, nombre, descripcion, duracion_minutos,
-                        precio, activo, eliminado, created_at, updated_at,
-                        created_by, updated_by
-                    FROM servicios
-                    WHERE id = %s
-                    """,
-                    (servicio_id,)
-                )
-                result = cursor.fetchone()
+            result = None
+            for stmt_cursor in cursor.execute(_UPDATE_TEMPLATES[mask], params, multi=True):
+                if stmt_cursor.with_rows:
+                    result = stmt_cursor.fetchone()
 
             if not result:
                 return None
 
-            # Convert tuple to dictionary
-            if isinstance(result, tuple):
-                columns = [desc[0] for desc in cursor.description]
-                result = dict(zip(columns, result))
-
             # Convert Decimal to float
             if result.get('precio') is not None:
                 result['precio'] = float(result['precio'])
 
-            logger.info(f"Service updated in MariaDB: id={servicio_id}, negocio_id={negocio_id}")
+            logger.info("Service updated in MariaDB: id=%s, negocio_id=%s", servicio_id, negocio_id)
             return result
 
         except Exception as e:
-            logger.error(f"Error updating service in MariaDB: {str(e)}")
+            logger.error("Error updating service in MariaDB: %s", e)
             raise
 
     async def delete_servicio_with_transaction(
@@ -351,14 +333,14 @@ class ServicioService:
             rows_affected = cursor.rowcount
 
             if rows_affected > 0:
-                logger.info(f"Service soft deleted in MariaDB: id={servicio_id}, negocio_id={negocio_id}")
+                logger.info("Service soft deleted in MariaDB: id=%s, negocio_id=%s", servicio_id, negocio_id)
                 return True
             else:
-                logger.warning(f"Service not found for deletion: id={servicio_id}, negocio_id={negocio_id}")
+                logger.warning("Service not found for deletion: id=%s, negocio_id=%s", servicio_id, negocio_id)
                 return False
 
         except Exception as e:
-            logger.error(f"Error deleting service in MariaDB: {str(e)}")
+            logger.error("Error deleting service in MariaDB: %s", e)
             raise
 
     async def get_all_active_services(
@@ -376,29 +358,18 @@ class ServicioService:
         Returns:
             List of active services
         """
+        # precio is cast in SQL so rows need no Decimal -> float pass
         cursor.execute(
             """
-            SELECT nombre, precio
+            SELECT nombre, CAST(precio AS DOUBLE) AS precio
             FROM servicios
             WHERE negocio_id = %s AND eliminado = FALSE
             ORDER BY nombre
             """,
             (negocio_id,)
         )
-        results = cursor.fetchall()
-
-        # Convert to list of dictionaries
-        services = []
-        for row in results:
-            if isinstance(row, tuple):
-                services.append({
-                    'nombre': row[0],
-                    'precio': row[1]
-                })
-            else:
-                services.append(row)
-
-        return services
+        # Cursor is opened with dictionary=True, rows are already dicts
+        return cursor.fetchall()
 
     def _get_db_config(self, key: str) -> str:
         """
@@ -11,6 +11,7 @@ import string
 import hashlib
 import json
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -383,7 +384,8 @@ def generate_file_hash(file_path: str, algorithm: str = 'sha256') -> str:
 def safe_json_loads(json_str: str, default: Any = None) -> Any:
     """Parse JSON de forma segura"""
     try:
-        return json.loads(json_str)
+        # orjson acepta str o bytes; su JSONDecodeError hereda de json.JSONDecodeError
+        return orjson.loads(json_str)
     except (json.JSONDecodeError, TypeError):
         return default
 
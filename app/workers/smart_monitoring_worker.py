@@ -3,8 +3,11 @@
 Worker mejorado con sistema de priorización de citas médicas
 """
 import asyncio
-from typing import Dict, List, Set, Optional
+import heapq
+from typing import Any, Dict, List, Set, Optional, Tuple
 import logging
+import math
+import time
 from datetime import datetime, timedelta, date
 from enum import Enum
 
@@ -21,6 +24,120 @@ class PriorityLevel(Enum):
     NORMAL = "NORMAL"      # > 60 min
     PAST_DUE = "PAST_DUE"  # Ya pasada
 
+# Valores de PriorityLevel como constantes (evita el acceso a .value en los bucles)
+_CRITICAL = PriorityLevel.CRITICAL.value
+_HIGH = PriorityLevel.HIGH.value
+_MEDIUM = PriorityLevel.MEDIUM.value
+_NORMAL = PriorityLevel.NORMAL.value
+_PAST_DUE = PriorityLevel.PAST_DUE.value
+
+# Orden para detectar subidas de prioridad
+_PRIORITY_ORDER = {
+    _NORMAL: 0,
+    _MEDIUM: 1,
+    _HIGH: 2,
+    _CRITICAL: 3
+}
+
+# Estados de cita que se monitorean
+_ESTADOS_ACTIVOS = ["pendiente", "confirmada"]
+
+# Firestore admite hasta 30 disyunciones por consulta: negocio IN (...) × estado IN (2)
+# deja 15 negocios por consulta
+_NEGOCIOS_PER_QUERY = 30 // len(_ESTADOS_ACTIVOS)
+
+# Plantillas por banda de prioridad; score y reason se completan por cita
+# (se conserva el orden de claves del payload original)
+_PAST_DUE_PRIORITY = {
+    'level': _PAST_DUE,
+    'score': 0,
+    'reason': 'Cita vencida',
+    'color': 'gray',
+    'pulse': False,
+    'sound_alert': False
+}
+_CRITICAL_PRIORITY = {
+    'level': _CRITICAL,
+    'score': None,
+    'reason': None,
+    'color': 'red',
+    'pulse': True,
+    'sound_alert': True,
+    'auto_focus': True
+}
+_HIGH_PRIORITY = {
+    'level': _HIGH,
+    'score': None,
+    'reason': None,
+    'color': 'orange',
+    'pulse': False,
+    'sound_alert': False,
+    'auto_focus': False
+}
+_MEDIUM_PRIORITY = {
+    'level': _MEDIUM,
+    'score': None,
+    'reason': None,
+    'color': 'yellow',
+    'pulse': False,
+    'sound_alert': False,
+    'auto_focus': False
+}
+_NORMAL_PRIORITY = {
+    'level': _NORMAL,
+    'score': None,
+    'reason': None,
+    'color': 'blue',
+    'pulse': False,
+    'sound_alert': False,
+    'auto_focus': False
+}
+
+# Límites de banda en minutos hasta la cita, de mayor a menor (ver _determine_priority)
+_BAND_BOUNDARIES = (60, 30, 15, -30)
+
+# Espera mínima entre recálculos por tiempo
+_MIN_WAIT_SECONDS = 1.0
+
+# Cada cuánto se relee la lista de negocios activos
+_NEGOCIOS_REFRESH_SECONDS = 300
+
+# Ventana para agrupar ráfagas de cambios de los listeners en un solo ciclo
+_DEBOUNCE_SECONDS = 2
+
+
+# Estados ya vistos; cada valor distinto se guarda una sola vez (hash-consing)
+_ESTADOS_CANONICOS: Dict[Any, Any] = {}
+
+
+def _canonical_estado(estado: Any) -> Any:
+    """Devolver la instancia compartida del estado"""
+    return _ESTADOS_CANONICOS.setdefault(estado, estado)
+
+
+def _seconds_to_next_band(minutes_until: float) -> float:
+    """Segundos hasta que la cita cruce el siguiente límite de banda"""
+    for boundary in _BAND_BOUNDARIES:
+        if minutes_until > boundary:
+            return (minutes_until - boundary) * 60
+    return math.inf
+
+
+def _priority_score(appointment: Dict[str, Any]) -> float:
+    """Clave de orden por score de prioridad"""
+    return appointment['priority']['score']
+
+
+def _docs_to_citas(docs) -> List[Dict[str, Any]]:
+    """Convertir documentos de Firestore en dicts con 'id'"""
+    citas = []
+    for doc in docs:
+        data = doc.to_dict()
+        data['id'] = doc.id
+        citas.append(data)
+    return citas
+
+
 class SmartFirestoreMonitoringWorker:
     """
     Worker inteligente que monitorea Firestore y calcula prioridades
@@ -31,9 +148,36 @@ class SmartFirestoreMonitoringWorker:
         self.running = False
         self.check_interval = 30  # segundos
         
-        # Cache de estados anteriores
-        self.previous_appointments = {}
-        self.previous_priorities = {}
+        # Cache de estados anteriores: negocio -> {cita_id: estado canónico}
+        self.previous_appointments: Dict[str, Dict[str, Any]] = {}
+        self.previous_priorities: Dict[str, Dict[str, str]] = {}
+        
+        # Listeners de Firestore (on_snapshot) sobre las citas de hoy
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty_event: Optional[asyncio.Event] = None
+        self._watches = []
+        self._watch_key = None
+        # Citas por negocio e id; se mantienen con el delta de cada snapshot
+        self._citas_by_negocio: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._dirty_negocios: Set[str] = set()
+        self._full_refresh = True
+        
+        # Negocios activos (se refrescan cada _NEGOCIOS_REFRESH_SECONDS)
+        self._negocios: Optional[List[str]] = None
+        self._negocios_expires_at = 0.0
+        
+        # Citas por negocio agrupadas por nivel de prioridad (último cálculo)
+        self._by_band: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        
+        # datetime de cada (fecha, hora) ya parseado; se vacía al cambiar el día
+        self._dt_cache: Dict[Tuple[str, str], datetime] = {}
+        self._dt_cache_day: Optional[str] = None
+        
+        # Próximo cambio de banda por negocio (time.monotonic())
+        self._band_deadlines: Dict[str, float] = {}
+        
+        # Último recálculo completo (time.monotonic())
+        self._last_full_refresh = 0.0
         
     async def start(self):
         """Iniciar el worker inteligente"""
@@ -41,130 +185,313 @@ class SmartFirestoreMonitoringWorker:
             return
             
         self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._dirty_event = asyncio.Event()
         logger.info("🧠 Starting Smart Monitoring Worker...")
         
         while self.running:
             try:
                 await self._smart_monitor_cycle()
-                await asyncio.sleep(self.check_interval)
+                
+                # Esperar a que un listener reporte cambios o a que alguna cita
+                # cambie de banda; check_interval sigue como tope
+                try:
+                    await asyncio.wait_for(self._dirty_event.wait(), timeout=self._next_wait_seconds())
+                    await asyncio.sleep(_DEBOUNCE_SECONDS)
+                except asyncio.TimeoutError:
+                    self._full_refresh = True
+                self._dirty_event.clear()
+                
+                # Aunque los listeners despierten el ciclo sin pausa, cada
+                # check_interval se recalculan todos los negocios (las claves
+                # de Redis expiran y las prioridades cambian con la hora)
+                if time.monotonic() - self._last_full_refresh >= self.check_interval:
+                    self._full_refresh = True
                 
             except Exception as e:
                 logger.error(f"Error in smart monitoring: {e}")
                 await asyncio.sleep(self.check_interval)
+        
+        self._unsubscribe_listeners()
+    
+    def _next_wait_seconds(self) -> float:
+        """Espera hasta el próximo cambio de banda o recálculo completo, acotada a [1s, check_interval]"""
+        now = time.monotonic()
+        remaining = self.check_interval - (now - self._last_full_refresh)
+        if self._band_deadlines:
+            remaining = min(remaining, min(self._band_deadlines.values()) - now)
+        return max(_MIN_WAIT_SECONDS, min(self.check_interval, remaining))
+    
+    def stop(self):
+        """Detener el worker"""
+        self.running = False
+        self._unsubscribe_listeners()
+        if self._dirty_event is not None:
+            self._dirty_event.set()
+        logger.info("🛑 Stopping Smart Monitoring Worker...")
     
     async def _smart_monitor_cycle(self):
         """Ciclo de monitoreo inteligente"""
 
         logger.debug("🔍 Starting monitoring cycle...")
         
+        # Referencia de tiempo única para todo el ciclo
+        now = datetime.now()
+        today = now.strftime("%d/%m/%Y")
+        
         # 1. Obtener SOLO citas de hoy y futuras reprogramadas
-        today_appointments = await self._get_relevant_appointments()
-        logger.info(f"📊 Se encontraron  {len(today_appointments)} citas")
-
-        # Mostrar today_appointments
-        logger.info("=== TODAY_APPOINTMENTS ===")
-        for negocio, appointments in today_appointments.items():
-            logger.info(f"Negocio: {negocio} - Total citas: {len(appointments)}")
-            for i, apt in enumerate(appointments):
-                logger.info(f"  [{i+1}] ID: {apt.get('id')} - Fecha: {apt.get('fecha')} - Estado: {apt.get('estado')}")
+        today_appointments = await self._get_relevant_appointments(today)
         
         # 2. Calcular prioridades para cada cita
-        appointments_with_priority = self._calculate_priorities(today_appointments)
+        appointments_with_priority = self._calculate_priorities(today_appointments, now, today)
+        
+        # 3. Detectar cambios significativos
+        changes = self._detect_intelligent_changes(appointments_with_priority)
+        
+        logger.info(
+            "📊 Ciclo de monitoreo: %d negocios, %d citas, %d negocios con cambios",
+            len(appointments_with_priority),
+            sum(len(appointments) for appointments in appointments_with_priority.values()),
+            len(changes)
+        )
+        
+        # Detalle por cita solo en DEBUG, en un único mensaje
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(self._format_cycle_dump(appointments_with_priority, changes))
+        
+        # 4. Actualizar cache
+        await self._update_cache(appointments_with_priority, now)
+        
+        # 5. Notificar solo si hay cambios relevantes
+        if changes:
+            await self._notify_smart_changes(changes)
 
-        # Mostrar appointments_with_priority
-        logger.info("=== APPOINTMENTS_WITH_PRIORITY ===")
+        logger.debug(f"✅ Monitoring cycle completed. Checked {len(today_appointments)} citas")
+    
+    def _format_cycle_dump(self, appointments_with_priority: Dict, changes: Dict) -> str:
+        """Armar el detalle del ciclo (citas, prioridades y cambios) como un solo texto"""
+        
+        lines = ["=== APPOINTMENTS_WITH_PRIORITY ==="]
         for negocio, appointments in appointments_with_priority.items():
-            logger.info(f"Negocio: {negocio} - Total citas: {len(appointments)}")
+            lines.append(f"Negocio: {negocio} - Total citas: {len(appointments)}")
             for i, apt in enumerate(appointments):
                 priority_info = apt.get('priority', {})
-                logger.info(f"  [{i+1}] ID: {apt.get('id')} - Prioridad: {priority_info.get('level')} - Score: {priority_info.get('score')}")
+                lines.append(
+                    f"  [{i+1}] ID: {apt.get('id')} - Fecha: {apt.get('fecha')} - Estado: {apt.get('estado')}"
+                    f" - Prioridad: {priority_info.get('level')} - Score: {priority_info.get('score')}"
+                )
         
-        # 3. Detectar cambios significativos
-        changes = self._detect_intelligent_changes(appointments_with_priority)
-
-        logger.info("=== CHANGES DETECTADOS ===")
+        lines.append("=== CHANGES DETECTADOS ===")
         if not changes:
-            logger.info("No se detectaron cambios significativos")
+            lines.append("No se detectaron cambios significativos")
         else:
             for negocio, change_types in changes.items():
-                logger.info(f"Negocio: {negocio}")
+                lines.append(f"Negocio: {negocio}")
                 for change_type, items in change_types.items():
                     if items:  # Solo mostrar categorías con cambios
-                        logger.info(f"  {change_type}: {len(items)} items")
+                        lines.append(f"  {change_type}: {len(items)} items")
                         for item in items:
-                            logger.info(f"    - ID: {item.get('id')} - Fecha: {item.get('fecha')}")
-
-        logger.info("=== FIN DE ANÁLISIS ===")
-        
-        # 4. Actualizar cache
-        await self._update_cache(appointments_with_priority)
+                            lines.append(f"    - ID: {item.get('id')} - Fecha: {item.get('fecha')}")
         
-        # 5. Notificar solo si hay cambios relevantes
-        if changes:
-            await self._notify_smart_changes(changes)
-
-        logger.debug(f"✅ Monitoring cycle completed. Checked {len(today_appointments)} citas")
+        lines.append("=== FIN DE ANÁLISIS ===")
+        return "\n".join(lines)
     
-    async def _get_relevant_appointments(self) -> Dict[str, List]:
+    async def _get_relevant_appointments(self, today: str) -> Dict[str, List]:
         """Obtener solo citas relevantes (hoy + reprogramadas)"""
         
         try:
-            # Query optimizada para Firestore
-            #today = date.today()
-            today = datetime.today().strftime("%d/%m/%Y")
+            # La lista de negocios activos cambia poco: se relee cada pocos minutos
+            # y no en cada despertar de los listeners
+            if self._negocios is None or time.monotonic() >= self._negocios_expires_at:
+                negocios = await self.firestore_service.get_all_active_negocios()
+                logger.info(f"Se encontraron  {len(negocios)} negocios")
+                
+                # Una lista vacía (o un error de lectura) se reintenta en el siguiente ciclo
+                if negocios:
+                    self._negocios = negocios
+                    self._negocios_expires_at = time.monotonic() + _NEGOCIOS_REFRESH_SECONDS
+            negocios = self._negocios or []
             
-            all_negocios = {}
-            negocios = await self.firestore_service.get_all_active_negocios()
-
-            logger.info(f"Se encontraron  {len(negocios)} negocios")
+            # Las citas llegan por los listeners; solo se re-registran cuando
+            # cambia el día o el conjunto de negocios activos
+            self._sync_listeners(today, negocios)
             
-            for negocio in negocios:
-                # Query compuesta: fecha_cita = hoy 
-                query_today = self.firestore_service.db.collection("citas") \
-                    .where("codigo_negocio", "==", negocio) \
-                    .where("fecha", "==", today) \
-                    .where("estado", "in", ["pendiente", "confirmada"])
-                
-                
-                # Combinar resultados
-                appointments = []
-                
-                for doc in query_today.stream():
-                    data = doc.to_dict()
-                    data['id'] = doc.id
-                    appointments.append(data)
-                
-                
-                if appointments:
-                    all_negocios[negocio] = appointments
-                    
-            return all_negocios
+            # Por tiempo se recalculan todos los negocios con citas (la prioridad
+            # depende de la hora); por eventos, solo los que recibieron cambios.
+            # Un negocio que quedó sin citas se omite hasta que su listener reporte algo
+            if self._full_refresh:
+                negocios_ciclo = {
+                    negocio for negocio, citas in self._citas_by_negocio.items() if citas
+                } | self._dirty_negocios
+                self._last_full_refresh = time.monotonic()
+            else:
+                negocios_ciclo = self._dirty_negocios
+            self._full_refresh = False
+            self._dirty_negocios = set()
+            
+            return {
+                negocio: list(self._citas_by_negocio.get(negocio, {}).values())
+                for negocio in negocios_ciclo
+            }
             
         except Exception as e:
             logger.error(f"Error getting relevant appointments: {e}")
             return {}
     
-    def _calculate_priorities(self, appointments_by_negocio: Dict) -> Dict:
+    def _sync_listeners(self, today: str, negocios: List[str]):
+        """Registrar un listener on_snapshot por grupo de negocios (codigo_negocio IN ...)"""
+        
+        watch_key = (today, frozenset(negocios))
+        if watch_key == self._watch_key:
+            return
+        
+        if self._watch_key is None or self._watch_key[0] != today:
+            self._citas_by_negocio = {}
+        else:
+            # Conservar las citas ya conocidas hasta que llegue el nuevo snapshot
+            self._citas_by_negocio = {
+                negocio: citas
+                for negocio, citas in self._citas_by_negocio.items()
+                if negocio in watch_key[1]
+            }
+        self._dirty_negocios &= set(self._citas_by_negocio)
+        self._full_refresh = True
+        
+        self._unsubscribe_listeners()
+        self._watch_key = watch_key
+        
+        # Índice compuesto: codigo_negocio, fecha, estado
+        citas_ref = self.firestore_service.db.collection("citas")
+        negocios = sorted(watch_key[1])
+        for i in range(0, len(negocios), _NEGOCIOS_PER_QUERY):
+            grupo = negocios[i:i + _NEGOCIOS_PER_QUERY]
+            query = (
+                citas_ref
+                    .where("codigo_negocio", "in", grupo)
+                    .where("fecha", "==", today)
+                    .where("estado", "in", _ESTADOS_ACTIVOS)
+            )
+            self._watches.append(query.on_snapshot(self._make_snapshot_callback(watch_key, grupo)))
+        
+        logger.info(f"👂 {len(self._watches)} listeners registrados para {len(negocios)} negocios")
+    
+    def _make_snapshot_callback(self, watch_key, grupo: List[str]):
+        """Callback de on_snapshot: corre en un hilo del SDK y delega al event loop"""
+        
+        initial = [True]
+        
+        def callback(docs, changes, read_time):
+            reset = initial[0]
+            if reset:
+                # El primer snapshot trae el resultado completo del grupo
+                initial[0] = False
+                citas = _docs_to_citas(docs)
+                removed = []
+            else:
+                # Los siguientes solo procesan el delta (ADDED/MODIFIED/REMOVED)
+                citas = _docs_to_citas(
+                    change.document for change in changes
+                    if change.type.name != 'REMOVED'
+                )
+                removed = _docs_to_citas(
+                    change.document for change in changes
+                    if change.type.name == 'REMOVED'
+                )
+            try:
+                self._loop.call_soon_threadsafe(
+                    self._apply_snapshot, watch_key, grupo, reset, citas, removed
+                )
+            except RuntimeError:
+                # El event loop ya se cerró
+                pass
+        
+        return callback
+    
+    def _apply_snapshot(
+        self,
+        watch_key,
+        grupo: List[str],
+        reset: bool,
+        citas: List[Dict[str, Any]],
+        removed: List[Dict[str, Any]]
+    ):
+        """Aplicar el delta del listener y marcar los negocios afectados"""
+        
+        # Ignorar snapshots de listeners ya reemplazados
+        if watch_key != self._watch_key:
+            return
+        
+        if reset:
+            for negocio in grupo:
+                if self._citas_by_negocio.pop(negocio, None):
+                    self._dirty_negocios.add(negocio)
+        
+        for data in citas:
+            negocio = data['codigo_negocio']
+            self._citas_by_negocio.setdefault(negocio, {})[data['id']] = data
+            self._dirty_negocios.add(negocio)
+        
+        for data in removed:
+            negocio = data['codigo_negocio']
+            self._citas_by_negocio.get(negocio, {}).pop(data['id'], None)
+            self._dirty_negocios.add(negocio)
+        
+        if self._dirty_negocios:
+            self._dirty_event.set()
+    
+    def _unsubscribe_listeners(self):
+        """Cancelar los listeners activos"""
+        
+        for watch in self._watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.error(f"Error unsubscribing listener: {e}")
+        self._watches = []
+        self._watch_key = None
+    
+    def _calculate_priorities(self, appointments_by_negocio: Dict, now: datetime, today: str) -> Dict:
         """Calcular prioridad para cada cita"""
         
         prioritized = {}
-        now = datetime.now()
+        calculated_at = now.isoformat()
+        
+        # Todas las citas comparten pocas fechas (normalmente solo hoy):
+        # hoy se construye desde `now` sin strptime y cualquier otra fecha
+        # se parsea una sola vez por ciclo
+        fechas: Dict[str, datetime] = {today: datetime(now.year, now.month, now.day)}
+        
+        # Fecha y hora ya combinadas por (fecha, hora); el cache vive solo durante el día
+        if self._dt_cache_day != today:
+            self._dt_cache = {}
+            self._dt_cache_day = today
+        dt_cache = self._dt_cache
         
         for negocio, appointments in appointments_by_negocio.items():
             prioritized[negocio] = []
             
+            # Índice por banda de prioridad, reutilizado por _update_cache
+            bands = self._by_band[negocio] = {level.value: [] for level in PriorityLevel}
+            next_band_change = math.inf
+            
             for appointment in appointments:
                 # Parsear hora de la cita
                 try:
-                    fecha_cita = datetime.strptime(appointment.get('fecha'), "%d/%m/%Y")
+                    fecha = appointment.get('fecha')
                     hora_cita = appointment.get('hora', '00:00')
+                    cita_datetime = dt_cache.get((fecha, hora_cita))
                     
-                    # Combinar fecha y hora
-                    hora_parts = hora_cita.split(':')
-                    cita_datetime = fecha_cita.replace(
-                        hour=int(hora_parts[0]),
-                        minute=int(hora_parts[1]) if len(hora_parts) > 1 else 0
-                    )
+                    if cita_datetime is None:
+                        fecha_cita = fechas.get(fecha)
+                        if fecha_cita is None:
+                            fecha_cita = fechas[fecha] = datetime.strptime(fecha, "%d/%m/%Y")
+                        
+                        # Combinar fecha y hora
+                        hora_parts = hora_cita.split(':')
+                        cita_datetime = dt_cache[(fecha, hora_cita)] = fecha_cita.replace(
+                            hour=int(hora_parts[0]),
+                            minute=int(hora_parts[1]) if len(hora_parts) > 1 else 0
+                        )
                     
                     # Calcular minutos hasta la cita
                     time_diff = cita_datetime - now
@@ -174,22 +501,27 @@ class SmartFirestoreMonitoringWorker:
                     priority = self._determine_priority(
                         minutes_until
                     )
+                    next_band_change = min(next_band_change, _seconds_to_next_band(minutes_until))
                     
                     # Agregar prioridad a la cita
                     appointment['priority'] = priority
                     appointment['minutes_until'] = minutes_until
-                    appointment['calculated_at'] = now.isoformat()
+                    appointment['calculated_at'] = calculated_at
                     
                     prioritized[negocio].append(appointment)
                     
                 except Exception as e:
                     logger.error(f"Error calculating priority for appointment {appointment.get('id')}: {e}")
                     appointment['priority'] = {
-                        'level': PriorityLevel.NORMAL.value,
+                        'level': _NORMAL,
                         'score': 0,
                         'reason': 'Error en cálculo'
                     }
                     prioritized[negocio].append(appointment)
+                
+                bands[appointment['priority']['level']].append(appointment)
+            
+            self._band_deadlines[negocio] = time.monotonic() + next_band_change
         
         return prioritized
     
@@ -198,63 +530,34 @@ class SmartFirestoreMonitoringWorker:
         
         # Cita ya pasada
         if minutes_until < -30:
-            return {
-                'level': PriorityLevel.PAST_DUE.value,
-                'score': 0,
-                'reason': 'Cita vencida',
-                'color': 'gray',
-                'pulse': False,
-                'sound_alert': False
-            }
+            return _PAST_DUE_PRIORITY.copy()
         
         # Crítica: < 15 minutos o urgente
         if minutes_until <= 15:
-            return {
-                'level': PriorityLevel.CRITICAL.value,
-                'score': 100 - max(0, minutes_until),
-                'reason': f'⏰ En {int(max(0, minutes_until))} minutos',
-                'color': 'red',
-                'pulse': True,
-                'sound_alert': True,
-                'auto_focus': True
-            }
+            priority = _CRITICAL_PRIORITY.copy()
+            priority['score'] = 100 - max(0, minutes_until)
+            priority['reason'] = f'⏰ En {int(max(0, minutes_until))} minutos'
         
         # Alta: 15-30 minutos
         elif minutes_until <= 30:
-            return {
-                'level': PriorityLevel.HIGH.value,
-                'score': 85 - (minutes_until - 15),
-                'reason': f'Próxima: {int(minutes_until)} min',
-                'color': 'orange',
-                'pulse': False,
-                'sound_alert': False,
-                'auto_focus': False
-            }
+            priority = _HIGH_PRIORITY.copy()
+            priority['score'] = 85 - (minutes_until - 15)
+            priority['reason'] = f'Próxima: {int(minutes_until)} min'
         
         # Media: 30-60 
         elif minutes_until <= 60 :
-            return {
-                'level': PriorityLevel.MEDIUM.value,
-                'score': 70 - max(0, (minutes_until - 30) / 2),
-                'reason': f'En {int(minutes_until)} min',
-                'color': 'yellow', 
-                'pulse': False,
-                'sound_alert': False,
-                'auto_focus': False
-            }
+            priority = _MEDIUM_PRIORITY.copy()
+            priority['score'] = 70 - max(0, (minutes_until - 30) / 2)
+            priority['reason'] = f'En {int(minutes_until)} min'
         
         # Normal: > 60 minutos
         else:
             hours = int(minutes_until / 60)
-            return {
-                'level': PriorityLevel.NORMAL.value,
-                'score': max(10, 40 - hours * 5),
-                'reason': f'En {hours}h {int(minutes_until % 60)}m',
-                'color': 'blue',
-                'pulse': False,
-                'sound_alert': False,
-                'auto_focus': False
-            }
+            priority = _NORMAL_PRIORITY.copy()
+            priority['score'] = max(10, 40 - hours * 5)
+            priority['reason'] = f'En {hours}h {int(minutes_until % 60)}m'
+        
+        return priority
     
     def _detect_intelligent_changes(self, current_appointments: Dict) -> Dict:
         """Detectar solo cambios significativos"""
@@ -272,6 +575,7 @@ class SmartFirestoreMonitoringWorker:
             }
             
             previous = self.previous_appointments.get(negocio, {})
+            has_changes = False
             
             for appointment in appointments:
                 app_id = appointment['id']
@@ -279,100 +583,97 @@ class SmartFirestoreMonitoringWorker:
                 
                 # Verificar si es nueva
                 if app_id not in previous:
-                    if current_priority == PriorityLevel.CRITICAL.value:
+                    has_changes = True
+                    if current_priority == _CRITICAL:
                         changes['new_critical'].append(appointment)
                     else:
                         changes['new_appointments'].append(appointment)
                 else:
                     # Comparar con estado anterior
-                    prev_appointment = previous[app_id]
-                    prev_priority = self.previous_priorities.get(f"{negocio}:{app_id}")
+                    prev_estado = previous[app_id]
+                    prev_priority = self.previous_priorities.get(negocio, {}).get(app_id)
+                    
+                    # Sin cambios de estado ni de prioridad: nada que revisar
+                    if prev_priority == current_priority and prev_estado == appointment.get('estado'):
+                        continue
                     
                     # Cambio de prioridad
                     if prev_priority and prev_priority != current_priority:
-                        if current_priority == PriorityLevel.CRITICAL.value:
+                        if current_priority == _CRITICAL:
                             changes['became_critical'].append(appointment)
+                            has_changes = True
                         elif self._is_priority_upgrade(prev_priority, current_priority):
                             changes['priority_upgraded'].append(appointment)
+                            has_changes = True
                     
                     # Cambio de estado
-                    if prev_appointment.get('estado') != appointment.get('estado'):
+                    if prev_estado != appointment.get('estado'):
                         changes['status_changed'].append(appointment)
+                        has_changes = True
                     
                     # Fue reprogramada
                     # if not prev_appointment.get('fue_reprogramada') and appointment.get('fue_reprogramada'):
                     #     changes['rescheduled'].append(appointment)
             
             # Solo agregar si hay cambios
-            if any(changes.values()):
+            if has_changes:
                 all_changes[negocio] = changes
         
         return all_changes
     
     def _is_priority_upgrade(self, old_priority: str, new_priority: str) -> bool:
         """Verificar si la prioridad subió"""
-        priority_order = {
-            PriorityLevel.NORMAL.value: 0,
-            PriorityLevel.MEDIUM.value: 1,
-            PriorityLevel.HIGH.value: 2,
-            PriorityLevel.CRITICAL.value: 3
-        }
-        
-        return priority_order.get(new_priority, 0) > priority_order.get(old_priority, 0)
+        return _PRIORITY_ORDER.get(new_priority, 0) > _PRIORITY_ORDER.get(old_priority, 0)
     
-    async def _update_cache(self, appointments_with_priority: Dict):
+    async def _update_cache(self, appointments_with_priority: Dict, now: datetime):
         """Actualizar cache con nueva información"""
         
-        # Actualizar previous_appointments
-        self.previous_appointments = {}
+        # Descartar negocios que ya no se monitorean (cambio de día o inactivos)
+        for negocio in list(self.previous_appointments):
+            if negocio not in self._citas_by_negocio:
+                del self.previous_appointments[negocio]
+                self.previous_priorities.pop(negocio, None)
+                self._by_band.pop(negocio, None)
+                self._band_deadlines.pop(negocio, None)
+        
+        # Actualizar previous_appointments solo de los negocios procesados
         for negocio, appointments in appointments_with_priority.items():
             self.previous_appointments[negocio] = {
-                app['id']: app for app in appointments
+                app['id']: _canonical_estado(app.get('estado')) for app in appointments
             }
             
-            # Actualizar prioridades
-            for app in appointments:
-                key = f"{negocio}:{app['id']}"
-                self.previous_priorities[key] = app['priority']['level']
+            # Actualizar prioridades (solo las citas actuales; las canceladas o
+            # eliminadas no quedan acumuladas)
+            self.previous_priorities[negocio] = {
+                app['id']: app['priority']['level'] for app in appointments
+            }
         
-        # Actualizar Redis con información agregada
+        # Actualizar Redis con información agregada (un solo pipeline)
+        payloads = {}
+        updated_at = now.isoformat()
         for negocio, appointments in appointments_with_priority.items():
-            # Ordenar por score de prioridad
-            sorted_apps = sorted(
-                appointments,
-                key=lambda x: x['priority']['score'],
-                reverse=True
-            )
-            
-            # Guardar top 10 críticas en Redis para acceso rápido
-            critical_apps = [
-                app for app in sorted_apps
-                if app['priority']['level'] in [PriorityLevel.CRITICAL.value, PriorityLevel.HIGH.value]
-            ][:10]
+            bands = self._by_band[negocio]
             
-            redis_client.set_json(
-                f"appointments:critical:{negocio}",
-                critical_apps,
-                ttl=120  # 2 minutos
+            # Guardar top 10 críticas (por score de prioridad) en Redis para acceso rápido
+            payloads[f"appointments:critical:{negocio}"] = heapq.nlargest(
+                10, bands[_CRITICAL] + bands[_HIGH], key=_priority_score
             )
             
             # Estadísticas
-            stats = {
+            payloads[f"appointments:stats:{negocio}"] = {
                 'total': len(appointments),
-                'critical': len([a for a in appointments if a['priority']['level'] == PriorityLevel.CRITICAL.value]),
-                'high': len([a for a in appointments if a['priority']['level'] == PriorityLevel.HIGH.value]),
-                'updated_at': datetime.now().isoformat()
+                'critical': len(bands[_CRITICAL]),
+                'high': len(bands[_HIGH]),
+                'updated_at': updated_at
             }
-            
-            redis_client.set_json(
-                f"appointments:stats:{negocio}",
-                stats,
-                ttl=120
-            )
+        
+        if payloads:
+            await asyncio.to_thread(redis_client.set_json_many, payloads, 120)  # 2 minutos
     
     async def _notify_smart_changes(self, changes: Dict):
         """Notificar cambios de forma inteligente"""
         
+        messages = {}
         for negocio, negocio_changes in changes.items():
             # Determinar tipo de notificación
             notification_type = self._determine_notification_type(negocio_changes)
@@ -411,10 +712,20 @@ class SmartFirestoreMonitoringWorker:
                     for app in critical_data[:5]  # Máximo 5 citas críticas
                 ]
             
-            # Notificar via WebSocket
-            await websocket_manager.notify_negocio_changes(negocio, message)
-            
-            logger.info(f"📡 Notified {notification_type} for negocio {negocio}")
+            messages[negocio] = message
+        
+        # Notificar via WebSocket: cada negocio tiene sus propias conexiones,
+        # así que los envíos van en paralelo y un fallo no bloquea al resto
+        results = await asyncio.gather(*(
+            websocket_manager.notify_negocio_changes(negocio, message)
+            for negocio, message in messages.items()
+        ), return_exceptions=True)
+        
+        for (negocio, message), result in zip(messages.items(), results):
+            if isinstance(result, Exception):
+                logger.error(f"Error notifying negocio {negocio}: {result}")
+            else:
+                logger.info(f"📡 Notified {message['notification_type']} for negocio {negocio}")
     
     def _determine_notification_type(self, changes: Dict) -> str:
         """Determinar el tipo de notificación según los cambios"""
@@ -0,0 +1,14 @@
+-- Migration: Indexes for medios_pago and promociones
+-- Description: Composite indexes matching the negocio_id / eliminado / activo
+--              predicates used by the payment-method and promotion services
+-- Date: 2026-10-17
+--
+-- Not under docker-entrypoint-initdb.d: both tables must already exist.
+-- Lookups by id use the primary key; these indexes serve the per-negocio
+-- list/sync queries (WHERE negocio_id = ? AND eliminado = FALSE AND activo = TRUE).
+
+CREATE INDEX IF NOT EXISTS idx_medios_pago_negocio_flags
+    ON medios_pago (negocio_id, eliminado, activo, descripcion);
+
+CREATE INDEX IF NOT EXISTS idx_promociones_negocio_flags
+    ON promociones (negocio_id, eliminado, activo, fecha_inicio);
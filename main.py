@@ -140,6 +140,10 @@ async def shutdown_handler():
     try:
         # Detener workers de background
         await stop_background_tasks()
+
+        # Cerrar el cliente HTTP compartido de reCAPTCHA
+        from app.services.recaptcha_service import close_http_client
+        await close_http_client()
         
         logger.info("✅ Workers detenidos correctamente")
         logger.info("✅ Aplicación cerrada limpiamente")
@@ -0,0 +1,53 @@
+"""Lectura de horarios desde MariaDB con filas de dia_semana inválidas"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+pytest.importorskip("mysql.connector")
+
+from app.services.horario_service import HorarioService
+
+
+class _FakeCursor:
+    """Cursor dictionary=True que devuelve filas fijas"""
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeFirestoreService:
+    def __init__(self):
+        self.db = None
+
+
+def _row(k, dia_semana, hora_inicio=None, hora_fin=None, intervalo_citas=None):
+    return {
+        'k': k,
+        'dia_semana': dia_semana,
+        'hora_inicio': hora_inicio,
+        'hora_fin': hora_fin,
+        'intervalo_citas': intervalo_citas
+    }
+
+
+def test_dia_semana_null_se_ignora():
+    service = HorarioService(_FakeFirestoreService())
+    cursor = _FakeCursor([
+        _row('h', None, timedelta(hours=8), timedelta(hours=12)),
+        _row('h', 1, timedelta(hours=9), timedelta(hours=13)),
+        _row('c', None, intervalo_citas=20)
+    ])
+
+    result = asyncio.run(service.get_horarios_from_mariadb(cursor, 7))
+
+    assert result['horarios']['lunes'] == [{'inicio': '09:00', 'fin': '13:00'}]
+    assert sum(result['dias_laborables'].values()) == 1
+    assert result['intervalo_citas'] == 20
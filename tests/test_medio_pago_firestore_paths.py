@@ -0,0 +1,71 @@
+"""Rutas de campo de datos_pago en las actualizaciones incrementales de Firestore"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+from google.cloud.firestore_v1 import _helpers
+
+from app.services.medio_pago_service import MedioPagoService
+
+
+_DOCUMENT_PATH = "projects/p/databases/(default)/documents/negocios/1"
+
+
+class _FakeDocRef:
+    """DocumentReference que guarda el dict pasado a update()"""
+
+    def __init__(self):
+        self.updates = []
+
+    async def update(self, field_updates):
+        # Mismo parseo de rutas que hace el cliente real antes de enviar el commit
+        _helpers.pbs_for_update(_DOCUMENT_PATH, field_updates, None)
+        self.updates.append(field_updates)
+
+
+class _FakeCollection:
+    def __init__(self, doc_ref):
+        self._doc_ref = doc_ref
+
+    def document(self, doc_id):
+        return self._doc_ref
+
+
+class _FakeDb:
+    def __init__(self):
+        self.doc_ref = _FakeDocRef()
+
+    def collection(self, name):
+        return _FakeCollection(self.doc_ref)
+
+
+class _FakeFirestoreService:
+    def __init__(self):
+        self.db = None
+        self.async_db = _FakeDb()
+
+
+def test_add_payment_method_con_descripcion_acentuada():
+    firestore_service = _FakeFirestoreService()
+    service = MedioPagoService(firestore_service)
+
+    asyncio.run(service.sync_add_or_update_payment_method(1, {
+        'descripcion': 'Tarjeta de Crédito',
+        'nombre_titular': 'Ana',
+        'numero_cuenta': '123'
+    }))
+
+    (update,) = firestore_service.async_db.doc_ref.updates
+    assert update['datos_pago.`tarjeta_de_crédito`'] == {'nombre': 'Ana', 'numero': '123'}
+
+
+def test_remove_payment_method_con_descripcion_acentuada():
+    firestore_service = _FakeFirestoreService()
+    service = MedioPagoService(firestore_service)
+
+    asyncio.run(service.sync_remove_payment_method(1, 'Tarjeta de Crédito'))
+
+    (update,) = firestore_service.async_db.doc_ref.updates
+    assert 'datos_pago.`tarjeta_de_crédito`' in update
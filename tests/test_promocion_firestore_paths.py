@@ -0,0 +1,83 @@
+"""Rutas de campo del mapa promociones en el documento del negocio"""
+import asyncio
+from datetime import date
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+from google.cloud.firestore_v1 import _helpers
+
+from app.config import settings
+from app.services.promocion_service import PromocionService
+
+
+_DOCUMENT_PATH = "projects/p/databases/(default)/documents/negocios/7"
+
+
+class _FakeDocRef:
+    """DocumentReference que guarda el dict pasado a update()"""
+
+    def __init__(self):
+        self.updates = []
+
+    async def update(self, field_updates):
+        # Mismo parseo de rutas que hace el cliente real antes de enviar el commit
+        _helpers.pbs_for_update(_DOCUMENT_PATH, field_updates, None)
+        self.updates.append(field_updates)
+
+
+class _FakeCollection:
+    def __init__(self, doc_ref):
+        self._doc_ref = doc_ref
+
+    def document(self, doc_id):
+        return self._doc_ref
+
+
+class _FakeDb:
+    def __init__(self):
+        self.doc_ref = _FakeDocRef()
+
+    def collection(self, name):
+        return _FakeCollection(self.doc_ref)
+
+
+class _FakeFirestoreService:
+    def __init__(self):
+        self.db = None
+        self.async_db = _FakeDb()
+
+
+@pytest.fixture(autouse=True)
+def promociones_in_negocio(monkeypatch):
+    monkeypatch.setattr(settings, 'FIRESTORE_PROMOCIONES_IN_NEGOCIO', True)
+
+
+def test_sync_promocion_usa_ruta_entre_comillas():
+    firestore_service = _FakeFirestoreService()
+    service = PromocionService(firestore_service)
+
+    asyncio.run(service.sync_promocion_to_firestore({
+        'id': 123,
+        'negocio_id': 7,
+        'titulo': 'Verano',
+        'tipo_descuento': 'porcentaje',
+        'valor_descuento': 20.0,
+        'fecha_inicio': date(2025, 6, 1),
+        'fecha_fin': date(2025, 8, 31),
+        'activo': True
+    }))
+
+    (update,) = firestore_service.async_db.doc_ref.updates
+    assert update['promociones.`123`']['fecha_inicio'] == '2025-06-01'
+
+
+def test_delete_promocion_usa_ruta_entre_comillas():
+    firestore_service = _FakeFirestoreService()
+    service = PromocionService(firestore_service)
+
+    asyncio.run(service.delete_promocion_from_firestore(123, negocio_id=7))
+
+    (update,) = firestore_service.async_db.doc_ref.updates
+    assert 'promociones.`123`' in update
@@ -0,0 +1,82 @@
+"""Queries de promociones ejecutadas contra MariaDB real (se omiten si no hay servidor)"""
+from datetime import date
+
+import pytest
+
+mysql_connector = pytest.importorskip("mysql.connector")
+pytest.importorskip("firebase_admin")
+
+from app.core.database import _connection_config
+from app.schemas.promocion import PromocionResponse
+from app.services.promocion_service import _INSERT_PROMOCION_SQL, _UPDATE_TEMPLATES
+
+
+# Tabla temporaria: oculta la real solo en esta conexión y desaparece al cerrarla
+_CREATE_PROMOCIONES_SQL = """
+    CREATE TEMPORARY TABLE promociones (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        negocio_id INT NOT NULL,
+        titulo VARCHAR(255) NOT NULL,
+        descripcion TEXT NULL,
+        tipo_descuento VARCHAR(20) NOT NULL,
+        valor_descuento DECIMAL(10, 2) NOT NULL,
+        fecha_inicio DATE NOT NULL,
+        fecha_fin DATE NOT NULL,
+        activo BOOLEAN NOT NULL DEFAULT TRUE,
+        eliminado BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP,
+        created_by INT NULL,
+        updated_by INT NULL
+    )
+"""
+
+
+@pytest.fixture
+def cursor():
+    try:
+        conn = mysql_connector.connect(**_connection_config())
+    except mysql_connector.Error as e:
+        pytest.skip(f"MariaDB no disponible: {e}")
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(_CREATE_PROMOCIONES_SQL)
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
+
+
+def _insert(cursor) -> dict:
+    cursor.execute(
+        _INSERT_PROMOCION_SQL,
+        (7, "Verano", "20% en todo", "porcentaje", 20.0,
+         date(2025, 6, 1), date(2025, 8, 31), True, 1)
+    )
+    return cursor.fetchone()
+
+
+def test_insert_returning_devuelve_fechas(cursor):
+    row = _insert(cursor)
+
+    assert row['fecha_inicio'] == date(2025, 6, 1)
+    assert row['fecha_fin'] == date(2025, 8, 31)
+    assert row['valor_descuento'] == 20.0
+    PromocionResponse(**row)
+
+
+def test_update_template_devuelve_fechas(cursor):
+    created = _insert(cursor)
+
+    # Bit 5 = fecha_fin en _UPDATE_FIELDS
+    result = None
+    params = (date(2025, 9, 30), 2, created['id'], 7, created['id'], 7)
+    for stmt_cursor in cursor.execute(_UPDATE_TEMPLATES[1 << 5], params, multi=True):
+        if stmt_cursor.with_rows:
+            result = stmt_cursor.fetchone()
+
+    assert result['fecha_inicio'] == date(2025, 6, 1)
+    assert result['fecha_fin'] == date(2025, 9, 30)
+    PromocionResponse(**result)
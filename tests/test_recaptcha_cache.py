@@ -0,0 +1,50 @@
+"""Cache de verificaciones reCAPTCHA: solo se reutilizan los rechazos"""
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("orjson")
+
+from app.config import settings
+from app.services import recaptcha_service
+from app.services.recaptcha_service import RecaptchaService
+
+
+def _service(monkeypatch, payload):
+    """RecaptchaService habilitado cuyo siteverify responde `payload`; devuelve (service, llamadas)"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=payload)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(recaptcha_service, '_get_http_client', lambda timeout: client)
+    monkeypatch.setattr(settings, 'RECAPTCHA_SECRET_KEY', 'x' * 40)
+    return RecaptchaService(), calls
+
+
+def test_exito_no_se_reutiliza(monkeypatch):
+    service, calls = _service(monkeypatch, {'success': True, 'score': 0.9})
+
+    async def verify_twice():
+        first = await service.verify_token('token', '1.2.3.4')
+        second = await service.verify_token('token', '1.2.3.4')
+        return first, second
+
+    assert asyncio.run(verify_twice()) == (True, True)
+    # Cada verificación llega a Google, que es quien detecta el token repetido
+    assert len(calls) == 2
+
+
+def test_rechazo_se_cachea(monkeypatch):
+    service, calls = _service(monkeypatch, {'success': False, 'error-codes': ['invalid-input-response']})
+
+    async def verify_twice():
+        first = await service.verify_token('token', '1.2.3.4')
+        second = await service.verify_token('token', '1.2.3.4')
+        return first, second
+
+    assert asyncio.run(verify_twice()) == (False, False)
+    assert len(calls) == 1